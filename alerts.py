@@ -0,0 +1,190 @@
+import asyncio
+import html
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+import config
+from database import get_admin_ids
+from sender import BULK, priority
+
+logger = logging.getLogger(__name__)
+
+# Alerts counted towards ALERT_DIGEST_THRESHOLD are those of the last minute.
+RATE_WINDOW = 60
+
+review_kb = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="💳 Depozitlar", callback_data="admin_deposits")],
+        [InlineKeyboardButton(text="💸 Pul yechish", callback_data="admin_withdraws")],
+    ]
+)
+
+
+@dataclass
+class Alert:
+    kind: str
+    id: int
+    user_id: int
+    amount: int
+    text: str
+    photo_id: str | None = None
+    reply_markup: InlineKeyboardMarkup | None = None
+
+
+# Deposit and withdrawal alerts are queued here and sent by a background task,
+# so check_sent and withdraw_card never wait on the admin chat. Up to
+# ALERT_DIGEST_THRESHOLD alerts a minute are sent one by one; above that they
+# are collected for ALERT_DIGEST_INTERVAL seconds and sent as one digest.
+class AdminAlerts:
+    def __init__(self) -> None:
+        self._pending: deque[Alert] = deque()
+        self._recent: deque[float] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._next_admin = itertools.count()
+        self._bot: Bot | None = None
+
+    def push(self, bot: Bot, alert: Alert) -> None:
+        self._bot = bot
+        self._recent.append(time.monotonic())
+        self._pending.append(alert)
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            with priority(BULK):
+                self._task = asyncio.create_task(self._run(bot))
+        self._wakeup.set()
+
+    def _busy(self) -> bool:
+        cutoff = time.monotonic() - RATE_WINDOW
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+        return len(self._recent) > config.ALERT_DIGEST_THRESHOLD
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._busy():
+                await asyncio.sleep(config.ALERT_DIGEST_INTERVAL)
+                alerts, self._pending = list(self._pending), deque()
+                await self._send_digest(bot, alerts)
+                continue
+            while self._pending and not self._busy():
+                # Dropped only once sent, so close() resends it if cancelled.
+                await self._send_alert(bot, self._pending[0])
+                self._pending.popleft()
+            if self._pending:
+                self._wakeup.set()
+
+    # Sends whatever is still queued, so a restart does not lose alerts that
+    # were waiting for the next digest.
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        alerts, self._pending = list(self._pending), deque()
+        if len(alerts) > config.ALERT_DIGEST_THRESHOLD:
+            await self._send_digest(self._bot, alerts)
+            return
+        for alert in alerts:
+            await self._send_alert(self._bot, alert)
+
+    def _recipients(self) -> list[int]:
+        return [config.ADMIN_ID, *sorted(get_admin_ids() - {config.ADMIN_ID})]
+
+    async def _send_alert(self, bot: Bot, alert: Alert) -> None:
+        admin_id = config.ADMIN_ID
+        if config.ALERT_FANOUT:
+            recipients = self._recipients()
+            admin_id = recipients[next(self._next_admin) % len(recipients)]
+        try:
+            if alert.photo_id:
+                await bot.send_photo(
+                    admin_id,
+                    photo=alert.photo_id,
+                    caption=alert.text,
+                    reply_markup=alert.reply_markup,
+                    parse_mode="HTML",
+                )
+            else:
+                await bot.send_message(
+                    admin_id, alert.text, reply_markup=alert.reply_markup, parse_mode="HTML"
+                )
+        except TelegramAPIError as e:
+            logger.warning("Admin alert for %s #%s failed: %s", alert.kind, alert.id, e)
+
+    async def _send_digest(self, bot: Bot, alerts: list[Alert]) -> None:
+        if not alerts:
+            return
+        text = f"📦 <b>So'nggi {config.ALERT_DIGEST_INTERVAL} soniyada:</b>\n"
+        for kind, title in (("deposit", "💳 Yangi depozitlar"), ("withdrawal", "💸 Yechish so'rovlari")):
+            group = [alert for alert in alerts if alert.kind == kind]
+            if group:
+                text += (
+                    f"\n{title}: {len(group)} ta, jami {sum(a.amount for a in group):,} so'm"
+                    f"\nID: #{group[0].id} – #{group[-1].id}\n"
+                )
+        if any(alert.photo_id for alert in alerts):
+            text += "\n🧾 Cheklarni «💳 Depozitlar» ro'yxatidagi tugmalar orqali ko'ring."
+        recipients = self._recipients() if config.ALERT_FANOUT else [config.ADMIN_ID]
+        for admin_id in recipients:
+            try:
+                await bot.send_message(admin_id, text, reply_markup=review_kb, parse_mode="HTML")
+            except TelegramAPIError as e:
+                logger.warning("Admin digest to %s failed: %s", admin_id, e)
+
+
+admin_alerts = AdminAlerts()
+
+
+def deposit_caption(deposit_id: int, user_id: int, tariff: str, amount: int) -> str:
+    return (
+        f"🔔 <b>Yangi depozit #{deposit_id}!</b>\n"
+        f"ID: <code>{user_id}</code>\n"
+        f"Tarif: {tariff}\n"
+        f"Summa: {amount:,}"
+    )
+
+
+def deposit_kb(deposit_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="✅ Tasdiqlash",
+                    callback_data=f"dep_ok_{deposit_id}",
+                )
+            ]
+        ]
+    )
+
+
+def alert_deposit(
+    bot: Bot, deposit_id: int, user_id: int, tariff: str, amount: int, photo_id: str
+) -> None:
+    text = deposit_caption(deposit_id, user_id, tariff, amount)
+    admin_alerts.push(
+        bot, Alert("deposit", deposit_id, user_id, amount, text, photo_id, deposit_kb(deposit_id))
+    )
+
+
+def alert_withdrawal(bot: Bot, withdrawal_id: int, user_id: int, amount: int, card_text: str) -> None:
+    text = (
+        f"💸 <b>Yangi yechish so'rovi #{withdrawal_id}!</b>\n\n"
+        f"ID: <code>{user_id}</code>\n"
+        f"Summa: {amount:,} so'm\n"
+        f"Karta: {html.escape(card_text)}\n\n"
+        "Tasdiqlash uchun admin panelga kiring."
+    )
+    admin_alerts.push(bot, Alert("withdrawal", withdrawal_id, user_id, amount, text))
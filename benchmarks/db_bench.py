@@ -0,0 +1,354 @@
+# Microbenchmarks for database.py against seeded databases of realistic size.
+#
+#   python benchmarks/db_bench.py                          # 10k, 100k and 1M users
+#   python benchmarks/db_bench.py --sizes 100000 --mode async --only page
+#   python benchmarks/db_bench.py --output before.jsonl
+#
+# Seeded databases are cached in --data-dir (built once per size with a fixed
+# random seed) and copied to a scratch file before each run, so write
+# benchmarks never touch the cached copy. Each size runs in its own process
+# because config.py and database.py read DB_PATH at import time.
+#
+# Output is one JSON object per benchmark and line:
+#   {"bench": "get_user", "users": 100000, "mode": "raw", "iterations": 500,
+#    "mean_us": ..., "p50_us": ..., "p95_us": ..., "p99_us": ..., "max_us": ...,
+#    "rev": "<git commit>", "sqlite": "<version>"}
+#
+# "raw" mode calls the undecorated functions directly on the main thread and
+# measures SQL and schema cost only. "async" mode goes through db_call and
+# db_write the way handlers do, including the thread hop, group commit and
+# the user cache.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SEED = 20240601
+USER_ID_BASE = 1_000_000_000
+TARIFFS = ("BASIC", "PRO", "ELITE")
+BONUS_CHANNELS = [f"@bonus_{i}" for i in range(5)]
+MANDATORY_CHANNELS = [f"@channel_{i}" for i in range(3)]
+PROMO_CODES = [f"PROMO{i}" for i in range(50)]
+BULK = 50
+
+
+def _user_rows(rng: random.Random, users: int) -> Iterator[tuple]:
+    for i in range(users):
+        deposited = rng.random() < 0.4
+        yield (
+            USER_ID_BASE + i,
+            rng.randrange(0, 200_000, 500),
+            rng.choice((0, 0, 0, 1, 2, 5)),
+            USER_ID_BASE + rng.randrange(i) if i and rng.random() < 0.3 else None,
+            rng.choice(TARIFFS) if deposited else "MEHMON",
+            int(deposited),
+            int(rng.random() < 0.05),
+        )
+
+
+def seed(database: Any, users: int) -> None:
+    rng = random.Random(SEED)
+    user_id = lambda: USER_ID_BASE + rng.randrange(users)  # noqa: E731
+    now = int(time.time())
+    with database.transaction() as conn:
+        conn.executemany("INSERT INTO admins VALUES (?)", [(i,) for i in range(1, 6)])
+        conn.executemany(
+            "INSERT INTO mandatory_channels VALUES (?)", [(c,) for c in MANDATORY_CHANNELS]
+        )
+        conn.executemany(
+            "INSERT INTO bonus_channels VALUES (?, ?)", [(c, 500) for c in BONUS_CHANNELS]
+        )
+        conn.executemany(
+            "INSERT INTO promos VALUES (?, ?, ?)", [(code, 5000, users) for code in PROMO_CODES]
+        )
+        conn.executemany(
+            "INSERT INTO users (user_id, balance, refs, referred_by, status, "
+            "first_deposit_done, blocked) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _user_rows(rng, users),
+        )
+        conn.executemany(
+            "INSERT INTO deposits (user_id, tariff, amount, photo_file_id, status) "
+            "VALUES (?, ?, ?, 'seed', ?)",
+            (
+                (
+                    user_id(),
+                    rng.choice(TARIFFS),
+                    rng.choice((10000, 20000, 35000)),
+                    "pending" if rng.random() < 0.02 else "confirmed",
+                )
+                for _ in range(users // 2)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO withdrawals (user_id, amount, card_text, status) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    user_id(),
+                    rng.randrange(15000, 100_000, 500),
+                    "8600 0000 0000 0000 Seed User",
+                    "pending" if rng.random() < 0.02 else "done",
+                )
+                for _ in range(users // 5)
+            ),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO promo_history (user_id, code) VALUES (?, ?)",
+            ((user_id(), rng.choice(PROMO_CODES)) for _ in range(users * 3 // 10)),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO bonus_history (user_id, channel_id) VALUES (?, ?)",
+            ((user_id(), rng.choice(BONUS_CHANNELS)) for _ in range(users // 2)),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO fsm_states (key, state, data, updated_at) "
+            "VALUES (?, 'UserStates:wait_screenshot', '{}', ?)",
+            ((f"1:{uid}:{uid}:::default", now) for uid in (user_id() for _ in range(users // 20))),
+        )
+
+
+async def _append_result(into: list, pending: Awaitable) -> None:
+    into.append(await pending)
+
+
+def benchmarks(database: Any, users: int, rng: random.Random) -> list[tuple[str, int, Callable]]:
+    conn = database.get_db()
+    user_id = lambda: USER_ID_BASE + rng.randrange(users)  # noqa: E731
+    new_user_ids = itertools.count(USER_ID_BASE + users)
+    fsm_keys = [row[0] for row in conn.execute("SELECT key FROM fsm_states LIMIT 1000")]
+    middle_deposit = conn.execute(
+        "SELECT id FROM deposits WHERE status = 'pending' ORDER BY id "
+        "LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM deposits WHERE status = 'pending')"
+    ).fetchone()
+    created_deposits: list[int] = []
+    # add_* and remove_* walk the same names, so removals hit existing rows.
+    added, removed = defaultdict(itertools.count), defaultdict(itertools.count)
+
+    def pending_ids(table: str) -> Iterator[int]:
+        return iter(
+            [row[0] for row in conn.execute(f"SELECT id FROM {table} WHERE status = 'pending'")]
+        )
+
+    def create_deposit(fn: Callable) -> Callable:
+        def run() -> Any:
+            result = fn(user_id(), rng.choice(TARIFFS), 10000, "bench")
+            if asyncio.iscoroutine(result):
+                return _append_result(created_deposits, result)
+            created_deposits.append(result)
+
+        return run
+
+    def confirm_deposit(fn: Callable) -> Callable:
+        ids = iter(created_deposits[::-1]) if created_deposits else pending_ids("deposits")
+        return lambda: fn(next(ids, 0))
+
+    def confirm_many(table: str) -> Callable:
+        def factory(fn: Callable) -> Callable:
+            ids = pending_ids(table)
+            return lambda: fn(list(itertools.islice(ids, BULK)))
+
+        return factory
+
+    def recipient_scan(fn: Callable) -> Callable:
+        async def scan_async() -> None:
+            after = 0
+            while batch := await fn(after, 500):
+                after = batch[-1]
+
+        def scan() -> None:
+            after = 0
+            while batch := fn(after, 500):
+                after = batch[-1]
+
+        return scan_async if asyncio.iscoroutinefunction(fn) else scan
+
+    first_page = database.FIRST_PAGE
+    # (name, iterations, factory). The factory runs untimed right before the
+    # benchmark; it gets the function to call (raw or decorated) and returns a
+    # zero-argument callable for one iteration. A ":suffix" names a variant.
+    return [
+        ("get_user", 500, lambda fn: lambda: fn(user_id())),
+        ("count_recipients", 20, lambda fn: lambda: fn()),
+        ("get_recipients_after:full_scan", max(1, 1_000_000 // users), recipient_scan),
+        ("get_stats", 200, lambda fn: lambda: fn()),
+        ("get_admins_page", 200, lambda fn: lambda: fn(first_page)),
+        ("get_mandatory_channels_page", 200, lambda fn: lambda: fn(first_page)),
+        ("get_promos_page", 200, lambda fn: lambda: fn(first_page)),
+        ("get_pending_deposits_page", 200, lambda fn: lambda: fn(first_page)),
+        (
+            "get_pending_deposits_page:middle",
+            200,
+            lambda fn: lambda: fn((">", middle_deposit[0] if middle_deposit else 0)),
+        ),
+        ("get_pending_withdrawals_page", 200, lambda fn: lambda: fn(first_page)),
+        ("has_bonus", 500, lambda fn: lambda: fn(user_id(), rng.choice(BONUS_CHANNELS))),
+        ("get_oldest_pending_deposit_id", 500, lambda fn: lambda: fn(user_id())),
+        ("get_fsm_record", 500, lambda fn: lambda: fn(rng.choice(fsm_keys), 0)),
+        ("add_user", 500, lambda fn: lambda: fn(next(new_user_ids), user_id())),
+        ("mark_blocked", 20, lambda fn: lambda: fn([user_id() for _ in range(500)])),
+        ("claim_bonus", 500, lambda fn: lambda: fn(user_id(), rng.choice(BONUS_CHANNELS))),
+        ("redeem_promo", 500, lambda fn: lambda: fn(user_id(), rng.choice(PROMO_CODES))),
+        ("create_deposit", 500, create_deposit),
+        ("confirm_deposit", 200, confirm_deposit),
+        ("confirm_deposits", 5, confirm_many("deposits")),
+        ("create_withdrawal", 500, lambda fn: lambda: fn(user_id(), 15000, "8600 Bench")),
+        ("confirm_withdrawals", 5, confirm_many("withdrawals")),
+        (
+            "save_fsm_record",
+            500,
+            lambda fn: lambda: fn(f"1:{user_id()}:0:::default", "UserStates:wait_promo_code", "{}"),
+        ),
+        ("delete_expired_fsm_records", 20, lambda fn: lambda: fn(0)),
+        ("add_promo", 50, lambda fn: lambda: fn(f"BENCH{next(added['promo'])}", 1000, 10)),
+        ("remove_promo", 50, lambda fn: lambda: fn(f"BENCH{next(removed['promo'])}")),
+        ("add_bonus_channel", 20, lambda fn: lambda: fn(f"@b{next(added['bonus'])}", 100)),
+        ("remove_bonus_channel", 20, lambda fn: lambda: fn(f"@b{next(removed['bonus'])}")),
+        ("add_mandatory_channel", 20, lambda fn: lambda: fn(f"@m{next(added['mand'])}")),
+        ("remove_mandatory_channel", 20, lambda fn: lambda: fn(f"@m{next(removed['mand'])}")),
+        ("add_admin", 20, lambda fn: lambda: fn(10_000 + next(added["admin"]))),
+        ("remove_admin", 20, lambda fn: lambda: fn(10_000 + next(removed["admin"]))),
+    ]
+
+
+def summarize(samples: list[int]) -> dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1000, 1)
+
+    return {
+        "mean_us": round(sum(ordered) / len(ordered) / 1000, 1),
+        "p50_us": pct(0.50),
+        "p95_us": pct(0.95),
+        "p99_us": pct(0.99),
+        "max_us": round(ordered[-1] / 1000, 1),
+    }
+
+
+async def run_size(args: argparse.Namespace, users: int) -> list[dict[str, Any]]:
+    import database
+
+    conn = database.get_db()
+    fresh = conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    database.migrate(conn)
+    if fresh:
+        started = time.perf_counter()
+        seed(database, users)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copy(os.environ["DB_PATH"], seeded_path(args.data_dir, users))
+        print(f"seeded {users} users in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    conn.execute("ANALYZE")
+    database._load_admins(conn)
+    database._load_channels(conn)
+
+    rng = random.Random(SEED)
+    meta = {"rev": git_rev(), "sqlite": sqlite3.sqlite_version}
+    results = []
+    for mode in ("raw", "async") if args.mode == "both" else (args.mode,):
+        for name, iterations, factory in benchmarks(database, users, rng):
+            if args.only and args.only not in name:
+                continue
+            base = name.split(":")[0]
+            if mode == "raw":
+                fn = getattr(database, "_read_user" if base == "get_user" else base)
+                fn = getattr(fn, "__wrapped__", fn)
+            else:
+                fn = getattr(database, base)
+            call = factory(fn)
+            samples = []
+            for _ in range(max(1, int(iterations * args.scale))):
+                started = time.perf_counter_ns()
+                result = call()
+                if asyncio.iscoroutine(result):
+                    await result
+                samples.append(time.perf_counter_ns() - started)
+            results.append(
+                {"bench": name, "users": users, "mode": mode, "iterations": len(samples)}
+                | summarize(samples)
+                | meta
+            )
+    await database.close_db()
+    return results
+
+
+def seeded_path(data_dir: str, users: int) -> Path:
+    return Path(data_dir) / f"bench-{users}.db"
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def child(args: argparse.Namespace) -> None:
+    users = args.child
+    scratch = Path(args.data_dir) / f"bench-{users}.work.db"
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{scratch}{suffix}").unlink(missing_ok=True)
+    if seeded_path(args.data_dir, users).exists():
+        shutil.copy(seeded_path(args.data_dir, users), scratch)
+
+    # config.py reads the environment at import time, so set it up first.
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+    os.environ["DB_PATH"] = str(scratch)
+    for row in asyncio.run(run_size(args, users)):
+        print(json.dumps(row), flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark database.py on seeded databases.")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated user counts")
+    parser.add_argument("--mode", choices=("raw", "async", "both"), default="raw")
+    parser.add_argument("--only", help="run benchmarks whose name contains this text")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply iteration counts")
+    parser.add_argument("--data-dir", default=str(ROOT / "benchmarks" / "data"))
+    parser.add_argument("--output", help="append results to this file instead of stdout")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    Path(args.data_dir).mkdir(parents=True, exist_ok=True)
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for users in (int(size) for size in args.sizes.split(",")):
+            command = [sys.executable, __file__, "--child", str(users), *child_args(args)]
+            proc = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True)
+            out.write(proc.stdout)
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def child_args(args: argparse.Namespace) -> list[str]:
+    extra = ["--mode", args.mode, "--scale", str(args.scale), "--data-dir", args.data_dir]
+    if args.only:
+        extra += ["--only", args.only]
+    return extra
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# Minimal stand-in for the Telegram Bot API, used by load_test.py.
+#
+# Serves POST /bot<token>/<method> the way api.telegram.org does. Updates
+# pushed with push_update() are handed out through long-polling getUpdates.
+# Sending methods answer with a plausible Message. When flood_limit is set,
+# any send beyond flood_limit per second gets a 429 with retry_after.
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Any
+
+from aiohttp import web
+
+BOT_USER = {"id": 1000000, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+SEND_METHODS = {
+    "sendmessage",
+    "sendphoto",
+    "copymessage",
+    "editmessagetext",
+    "editmessagecaption",
+}
+
+
+class FakeBotAPI:
+    def __init__(self, flood_limit: int = 0, flood_retry_after: int = 1) -> None:
+        self.flood_limit = flood_limit
+        self.flood_retry_after = flood_retry_after
+        self.calls: Counter[str] = Counter()
+        self.flood_errors = 0
+        self._updates: deque[dict[str, Any]] = deque()
+        self._next_update_id = 1
+        self._new_updates = asyncio.Event()
+        self._sent_at: deque[float] = deque()
+        self._next_message_id = 1
+        self._runner: web.AppRunner | None = None
+
+    def push_update(self, update: dict[str, Any]) -> int:
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append({"update_id": update_id, **update})
+        self._new_updates.set()
+        return update_id
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        self.calls[method] += 1
+        if method in SEND_METHODS and self._flooded():
+            self.flood_errors += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.flood_retry_after}",
+                    "parameters": {"retry_after": self.flood_retry_after},
+                },
+                status=429,
+            )
+        handler = getattr(self, f"_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    def _flooded(self) -> bool:
+        if not self.flood_limit:
+            return False
+        now = time.monotonic()
+        while self._sent_at and now - self._sent_at[0] >= 1:
+            self._sent_at.popleft()
+        if len(self._sent_at) >= self.flood_limit:
+            return True
+        self._sent_at.append(now)
+        return False
+
+    def _message(self, chat_id: Any) -> dict[str, Any]:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        chat_id = int(chat_id) if str(chat_id).lstrip("-").isdigit() else -100
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+
+    async def _getme(self, params: dict[str, Any]) -> dict[str, Any]:
+        return BOT_USER
+
+    async def _getupdates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = int(params.get("timeout") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return [self._updates[i] for i in range(min(limit, len(self._updates)))]
+
+    async def _sendmessage(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._message(params["chat_id"])
+
+    async def _sendphoto(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._message(params["chat_id"])
+
+    async def _copymessage(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {"message_id": self._message(params["chat_id"])["message_id"]}
+
+    async def _editmessagetext(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._message(params.get("chat_id") or 0)
+
+    async def _editmessagecaption(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._message(params.get("chat_id") or 0)
+
+    async def _getchatmember(self, params: dict[str, Any]) -> dict[str, Any]:
+        user_id = int(params["user_id"])
+        return {
+            "status": "member",
+            "user": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+        }
+
+    async def _getchat(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {"id": -100, "type": "channel", "title": str(params.get("chat_id"))}
+
@@ -0,0 +1,240 @@
+# End-to-end load test: runs the real Dispatcher and routers against the fake
+# Bot API in fake_bot_api.py. Synthetic users walk through /start, tariff
+# purchase, promo, bonus and withdrawal. The report shows throughput and
+# per-step handler latency.
+#
+#   python benchmarks/load_test.py --users 1000 --concurrency 200
+#   python benchmarks/load_test.py --users 1000 --flood-limit 30
+#   python benchmarks/load_test.py --users 200 --sql-trace
+#
+# A fresh database is created in a temp directory unless --db is given.
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PROMO_CODE = "BENCH"
+PROMO_AMOUNT = 20000
+BONUS_CHANNEL = "@bench_bonus"
+BONUS_AMOUNT = 500
+MANDATORY_CHANNEL = "@bench_channel"
+FIRST_USER_ID = 10_000_000
+
+# (step name, update builder). Each user runs the steps in order, waiting for
+# the bot to finish one update before sending the next.
+SCENARIO = [
+    ("start", lambda u: _message(u, f"/start {u - 1}" if u % 2 else "/start")),
+    ("tariffs", lambda u: _message(u, "💎 Tarif rejalarini tanlash")),
+    ("buy", lambda u: _callback(u, "buy_BASIC")),
+    ("receipt", lambda u: _photo(u)),
+    ("promo_menu", lambda u: _message(u, "🏷 Promokod ishlatish")),
+    ("promo_code", lambda u: _message(u, PROMO_CODE)),
+    ("bonus_menu", lambda u: _message(u, "🎁 Bonuslar")),
+    ("bonus_claim", lambda u: _callback(u, f"getbonus_{BONUS_CHANNEL}_{BONUS_AMOUNT}")),
+    ("cabinet", lambda u: _message(u, "👤 Shaxsiy kabinet")),
+    ("withdraw", lambda u: _message(u, "💸 Pul yechib olish")),
+    ("withdraw_card", lambda u: _message(u, "8600 0000 0000 0000 Bench User")),
+]
+
+
+def _user(user_id: int) -> dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+
+def _chat_message(user_id: int) -> dict[str, Any]:
+    return {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+    }
+
+
+def _message(user_id: int, text: str) -> dict[str, Any]:
+    return {"message": {**_chat_message(user_id), "text": text}}
+
+
+def _photo(user_id: int) -> dict[str, Any]:
+    photo = {"file_id": "bench-photo", "file_unique_id": "bench", "width": 1, "height": 1}
+    return {"message": {**_chat_message(user_id), "photo": [photo]}}
+
+
+def _callback(user_id: int, data: str) -> dict[str, Any]:
+    return {
+        "callback_query": {
+            "id": f"{user_id}-{time.monotonic_ns()}",
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "message": _chat_message(user_id),
+            "data": data,
+        }
+    }
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.handler: dict[str, list[float]] = defaultdict(list)
+        self.end_to_end: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self._pending: dict[int, tuple[str, float, asyncio.Future]] = {}
+
+    def expect(self, update_id: int, step: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending[update_id] = (step, time.perf_counter(), future)
+        return future
+
+    # Outer update middleware: times the whole dispatch of one update.
+    async def __call__(self, handler, event, data):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+        finally:
+            finished = time.perf_counter()
+            step, pushed_at, future = self._pending.pop(event.update_id, ("?", started, None))
+            self.handler[step].append(finished - started)
+            self.end_to_end[step].append(finished - pushed_at)
+            if failed:
+                self.errors[step] += 1
+            if future is not None and not future.done():
+                future.set_result(None)
+
+
+async def run_user(api, recorder: Recorder, user_id: int) -> None:
+    for step, build in SCENARIO:
+        update_id = api.push_update(build(user_id))
+        await recorder.expect(update_id, step)
+
+
+async def main(args: argparse.Namespace) -> None:
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import database
+    import handlers_admin
+    import handlers_user
+    import metrics
+    import sender
+    from fake_bot_api import FakeBotAPI
+    from storage import SQLiteStorage
+
+    api = FakeBotAPI(flood_limit=args.flood_limit)
+    base_url = await api.start(port=args.port)
+
+    await database.init_db()
+    await database.add_promo(PROMO_CODE, PROMO_AMOUNT, args.users * 2)
+    await database.add_bonus_channel(BONUS_CHANNEL, BONUS_AMOUNT)
+    await database.add_mandatory_channel(MANDATORY_CHANNEL)
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(base_url))
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = Dispatcher(storage=SQLiteStorage())
+    dp.include_router(handlers_admin.router)
+    dp.include_router(handlers_user.router)
+    sender.install(bot)
+    metrics.instrument(bot, handlers_admin.router, handlers_user.router)
+    recorder = Recorder()
+    dp.update.outer_middleware(recorder)
+
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def user(user_id: int) -> None:
+        async with semaphore:
+            await run_user(api, recorder, user_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(FIRST_USER_ID + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    if args.metrics:
+        print(metrics.metrics.render())
+    if args.sql_trace:
+        import sqltrace
+
+        print(sqltrace.report(database.get_db()))
+        print()
+    await dp.stop_polling()
+    await polling
+    await dp.storage.close()
+    await bot.session.close()
+    await api.stop()
+    await database.close_db()
+
+    total = sum(len(samples) for samples in recorder.handler.values())
+    api_calls = sum(api.calls.values())
+    print(f"users={args.users} concurrency={args.concurrency} elapsed={elapsed:.2f}s")
+    print(f"updates={total} throughput={total / elapsed:.1f} updates/s")
+    print(
+        f"bot_api_calls={api_calls} ({api_calls / elapsed:.1f}/s) "
+        f"flood_errors={api.flood_errors}"
+    )
+    print()
+    print(f"{'step':<14}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'e2e p95':>9}")
+    for step, _ in SCENARIO:
+        samples = recorder.handler[step]
+        print(
+            f"{step:<14}{len(samples):>7}{recorder.errors[step]:>8}"
+            f"{percentile(samples, 0.50) * 1000:>9.2f}"
+            f"{percentile(samples, 0.95) * 1000:>9.2f}"
+            f"{percentile(samples, 0.99) * 1000:>9.2f}"
+            f"{percentile(recorder.end_to_end[step], 0.95) * 1000:>9.2f}"
+        )
+    all_samples = [s for samples in recorder.handler.values() for s in samples]
+    print(
+        f"{'all':<14}{total:>7}{sum(recorder.errors.values()):>8}"
+        f"{percentile(all_samples, 0.50) * 1000:>9.2f}"
+        f"{percentile(all_samples, 0.95) * 1000:>9.2f}"
+        f"{percentile(all_samples, 0.99) * 1000:>9.2f}"
+        f"{'':>9}"
+    )
+    if all_samples:
+        print(f"\nmean handler latency: {statistics.fmean(all_samples) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test against a fake Bot API.")
+    parser.add_argument("--users", type=int, default=500, help="synthetic users to simulate")
+    parser.add_argument("--concurrency", type=int, default=100, help="users active at once")
+    parser.add_argument("--flood-limit", type=int, default=0, help="sends/s before 429 (0 = off)")
+    parser.add_argument("--port", type=int, default=8081, help="fake Bot API port")
+    parser.add_argument("--metrics", action="store_true", help="print Prometheus metrics")
+    parser.add_argument("--sql-trace", action="store_true", help="print per-query SQL timings")
+    parser.add_argument("--db", help="database path (default: fresh temp file)")
+    args = parser.parse_args()
+
+    # config.py reads the environment at import time, so set it up first.
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+    os.environ.setdefault("ADMIN_ID", "1")
+    os.environ["BOT_MODE"] = "polling"
+    # Synthetic users send their next step as soon as the bot answers, far
+    # faster than Telegram's limits allow. The fake API only enforces
+    # --flood-limit, so lift the send limits unless set explicitly.
+    os.environ.setdefault("SEND_RATE", "100000")
+    os.environ.setdefault("SEND_CHAT_RATE", "1000")
+    os.environ.setdefault("SEND_CHAT_BURST", "1000")
+    if args.sql_trace:
+        os.environ["SQL_TRACE"] = "1"
+    os.environ["DB_PATH"] = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    logging.basicConfig(level=logging.WARNING)
+
+    asyncio.run(main(args))
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+
+import config
+from database import count_recipients, get_recipients_after, mark_blocked
+from sender import BULK, TokenBucket, priority
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+PROGRESS_INTERVAL = 5
+
+_tasks: set[asyncio.Task] = set()
+
+
+@dataclass
+class BroadcastStats:
+    total: int
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    def eta(self) -> int:
+        elapsed = time.monotonic() - self.started_at
+        if not self.done:
+            return 0
+        return int(elapsed / self.done * max(self.total - self.done, 0))
+
+    def render(self, finished: bool = False) -> str:
+        title = "✅ <b>Reklama yakunlandi.</b>" if finished else "📣 <b>Reklama yuborilmoqda...</b>"
+        text = (
+            f"{title}\n\n"
+            f"✅ Yuborildi: {self.sent}\n"
+            f"🚫 Bloklaganlar: {self.blocked}\n"
+            f"❌ Xatoliklar: {self.failed}\n"
+            f"📊 Jarayon: {self.done}/{self.total}"
+        )
+        if not finished:
+            minutes, seconds = divmod(self.eta(), 60)
+            text += f"\n⏱ Qolgan vaqt: ~{minutes} daq {seconds} s"
+        return text
+
+
+class Broadcast:
+    def __init__(self, bot: Bot, from_chat_id: int, message_id: int, status_message_id: int) -> None:
+        self.bot = bot
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.status_message_id = status_message_id
+        self.bucket = TokenBucket(config.BROADCAST_RATE)
+        self.queue: asyncio.Queue[int | None] = asyncio.Queue(maxsize=config.BROADCAST_CONCURRENCY * 2)
+        self.blocked_ids: list[int] = []
+        self.stats = BroadcastStats(total=0)
+
+    async def run(self) -> None:
+        self.stats = BroadcastStats(total=await count_recipients())
+        workers = [asyncio.create_task(self._worker()) for _ in range(config.BROADCAST_CONCURRENCY)]
+        reporter = asyncio.create_task(self._report_progress())
+        try:
+            await self._produce()
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            for worker in workers:
+                worker.cancel()
+            await self._flush_blocked()
+        await self._update_status(finished=True)
+
+    async def _produce(self) -> None:
+        after = 0
+        while True:
+            user_ids = await get_recipients_after(after, BATCH_SIZE)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                await self.queue.put(user_id)
+            after = user_ids[-1]
+        for _ in range(config.BROADCAST_CONCURRENCY):
+            await self.queue.put(None)
+
+    async def _worker(self) -> None:
+        while (user_id := await self.queue.get()) is not None:
+            await self._send(user_id)
+            if len(self.blocked_ids) >= BATCH_SIZE:
+                await self._flush_blocked()
+
+    # Rate limits and RetryAfter are handled by the send scheduler; the bucket
+    # only keeps one broadcast from taking more than BROADCAST_RATE.
+    async def _send(self, user_id: int) -> None:
+        await self.bucket.acquire()
+        try:
+            await self.bot.copy_message(user_id, self.from_chat_id, self.message_id)
+        except TelegramForbiddenError:
+            self.stats.blocked += 1
+            self.blocked_ids.append(user_id)
+        except TelegramAPIError as e:
+            logger.debug("Broadcast to %s failed: %s", user_id, e)
+            self.stats.failed += 1
+        else:
+            self.stats.sent += 1
+
+    async def _flush_blocked(self) -> None:
+        user_ids, self.blocked_ids = self.blocked_ids, []
+        if user_ids:
+            await mark_blocked(user_ids)
+
+    async def _report_progress(self) -> None:
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            await self._update_status()
+
+    async def _update_status(self, finished: bool = False) -> None:
+        try:
+            await self.bot.edit_message_text(
+                self.stats.render(finished),
+                chat_id=self.from_chat_id,
+                message_id=self.status_message_id,
+                parse_mode="HTML",
+            )
+        except TelegramAPIError:
+            pass
+
+
+async def notify_users(bot: Bot, user_ids: list[int], text: str) -> int:
+    semaphore = asyncio.Semaphore(config.BROADCAST_CONCURRENCY)
+
+    async def send(user_id: int) -> bool:
+        async with semaphore:
+            try:
+                await bot.send_message(user_id, text)
+            except TelegramAPIError as e:
+                logger.debug("Notification to %s failed: %s", user_id, e)
+                return False
+            return True
+
+    # Tasks copy the context when created, so only these sends are bulk.
+    with priority(BULK):
+        results = await asyncio.gather(*(send(user_id) for user_id in dict.fromkeys(user_ids)))
+    return sum(results)
+
+
+def start_broadcast(bot: Bot, from_chat_id: int, message_id: int, status_message_id: int) -> None:
+    with priority(BULK):
+        task = asyncio.create_task(
+            Broadcast(bot, from_chat_id, message_id, status_message_id).run()
+        )
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
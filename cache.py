@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import config
+
+
+class TTLCache:
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def expire(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._data.items() if expires_at < now]:
+            del self._data[key]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> None:
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# Thread-safe LRU shared by the event loop and the database threads. Every
+# put/invalidate bumps the generation and stamps the key with it; a reader
+# passes the generation it started at to fill() and is ignored if its key was
+# written since, so a slow read can never overwrite a fresher write-through
+# value. Stamps are kept for the last maxsize written keys; older keys count as
+# written when the newest forgotten stamp was.
+class LRUCache:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._written: OrderedDict[Hashable, int] = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _insert(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _stamp(self, key: Hashable) -> None:
+        self.generation += 1
+        self._written[key] = self.generation
+        self._written.move_to_end(key)
+        while len(self._written) > self.maxsize:
+            _, self._forgotten = self._written.popitem(last=False)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._stamp(key)
+            self._insert(key, value)
+
+    def fill(self, key: Hashable, value: Any, generation: int) -> None:
+        with self._lock:
+            written = self._written.get(key, self._forgotten)
+            if written <= generation and key not in self._data:
+                self._insert(key, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._stamp(key)
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Positive (channel_id, user_id) membership results from check_sub.
+subscriptions = TTLCache(ttl=config.SUB_CACHE_TTL, maxsize=config.SUB_CACHE_SIZE)
+
+
+def invalidate_channel(channel_id: str) -> None:
+    subscriptions.invalidate(lambda key: key[0] == channel_id)
+
+
+# User rows by user_id, kept current by every write in database.py.
+users = LRUCache(maxsize=config.USER_CACHE_SIZE)
+
+# Rendered menus keyed by name, cleared when the data behind them changes.
+menus = LRUCache(maxsize=16)
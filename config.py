@@ -1,29 +1,84 @@
-import os
-
-
-def _get_env_int(name: str, default: int) -> int:
-    value = os.getenv(name)
-    if value is None or value == "":
-        return default
-    if not value.isdigit():
-        raise ValueError(f"{name} must be an integer.")
-    return int(value)
-
-
-BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
-if not BOT_TOKEN:
-    raise ValueError("BOT_TOKEN is required. Set it in environment variables.")
-
-ADMIN_ID = _get_env_int("ADMIN_ID", 0)
-
-CARD_NUMBER = os.getenv("CARD_NUMBER", "5614681621153729")
-CARD_HOLDER = os.getenv("CARD_HOLDER", "Bafoyev.I")
-
-MIN_WITHDRAW = _get_env_int("MIN_WITHDRAW", 15000)
-FIRST_DEPOSIT_BONUS = _get_env_int("FIRST_DEPOSIT_BONUS", 0)
-
-TARIFFS = {
-    "BASIC": {"amount": 10000, "ref_bonus": 1000},
-    "PRO": {"amount": 20000, "ref_bonus": 2500},
-    "ELITE": {"amount": 35000, "ref_bonus": 3200},
-}
+import os
+
+
+def _get_env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    if not value.isdigit():
+        raise ValueError(f"{name} must be an integer.")
+    return int(value)
+
+
+BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
+if not BOT_TOKEN:
+    raise ValueError("BOT_TOKEN is required. Set it in environment variables.")
+
+ADMIN_ID = _get_env_int("ADMIN_ID", 0)
+
+CARD_NUMBER = os.getenv("CARD_NUMBER", "5614681621153729")
+CARD_HOLDER = os.getenv("CARD_HOLDER", "Bafoyev.I")
+
+MIN_WITHDRAW = _get_env_int("MIN_WITHDRAW", 15000)
+FIRST_DEPOSIT_BONUS = _get_env_int("FIRST_DEPOSIT_BONUS", 0)
+
+DB_PATH = os.getenv("DB_PATH", "bot.db")
+DB_POOL_SIZE = _get_env_int("DB_POOL_SIZE", 4)
+DB_BUSY_TIMEOUT_MS = _get_env_int("DB_BUSY_TIMEOUT_MS", 5000)
+DB_WRITE_BATCH_MS = _get_env_int("DB_WRITE_BATCH_MS", 5)
+DB_WRITE_BATCH_SIZE = _get_env_int("DB_WRITE_BATCH_SIZE", 200)
+# SQL tracing is off unless SQL_TRACE=1; it costs a few microseconds per statement.
+SQL_TRACE = _get_env_int("SQL_TRACE", 0) == 1
+SQL_SLOW_MS = _get_env_int("SQL_SLOW_MS", 50)
+
+SEND_RATE = _get_env_int("SEND_RATE", 30)
+SEND_CHAT_RATE = _get_env_int("SEND_CHAT_RATE", 1)
+SEND_CHAT_BURST = _get_env_int("SEND_CHAT_BURST", 3)
+SEND_MAX_RETRIES = _get_env_int("SEND_MAX_RETRIES", 3)
+
+# Above ALERT_DIGEST_THRESHOLD deposit/withdrawal alerts a minute, admins get a
+# digest every ALERT_DIGEST_INTERVAL seconds instead of one message each.
+ALERT_DIGEST_THRESHOLD = _get_env_int("ALERT_DIGEST_THRESHOLD", 10)
+ALERT_DIGEST_INTERVAL = _get_env_int("ALERT_DIGEST_INTERVAL", 60)
+ALERT_FANOUT = _get_env_int("ALERT_FANOUT", 0) == 1
+
+BROADCAST_RATE = _get_env_int("BROADCAST_RATE", 30)
+BROADCAST_CONCURRENCY = _get_env_int("BROADCAST_CONCURRENCY", 20)
+
+SUB_CACHE_TTL = _get_env_int("SUB_CACHE_TTL", 600)
+SUB_CACHE_SIZE = _get_env_int("SUB_CACHE_SIZE", 100000)
+
+ADMIN_PAGE_SIZE = _get_env_int("ADMIN_PAGE_SIZE", 10)
+CHANNELS_REFRESH_INTERVAL = _get_env_int("CHANNELS_REFRESH_INTERVAL", 10)
+
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError("BOT_MODE must be 'polling' or 'webhook'.")
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip().rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = _get_env_int("WEBHOOK_PORT", 8080)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip()
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise ValueError("WEBHOOK_URL is required when BOT_MODE is 'webhook'.")
+# Without it anyone who finds the URL can post forged updates, e.g. from ADMIN_ID.
+if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+    raise ValueError("WEBHOOK_SECRET is required when BOT_MODE is 'webhook'.")
+
+FSM_STATE_TTL = _get_env_int("FSM_STATE_TTL", 86400)
+# Several webhook workers may serve the same user, so by default they always
+# read FSM state from the database instead of a local copy.
+FSM_CACHE_TTL = _get_env_int("FSM_CACHE_TTL", 0 if BOT_MODE == "webhook" else 300)
+FSM_CACHE_SIZE = _get_env_int("FSM_CACHE_SIZE", 50000)
+USER_CACHE_SIZE = _get_env_int("USER_CACHE_SIZE", 0 if BOT_MODE == "webhook" else 50000)
+
+# Prometheus endpoint at http://METRICS_HOST:METRICS_PORT/metrics; 0 disables it.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _get_env_int("METRICS_PORT", 0)
+
+TARIFFS = {
+    "BASIC": {"amount": 10000, "ref_bonus": 1000},
+    "PRO": {"amount": 20000, "ref_bonus": 2500},
+    "ELITE": {"amount": 35000, "ref_bonus": 3200},
+}
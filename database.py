@@ -1,120 +1,1099 @@
-import sqlite3
-
-
-DB_PATH = "bot.db"
-
-
-def get_db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def init_db() -> None:
-    with get_db() as conn:
-        conn.execute("CREATE TABLE IF NOT EXISTS admins (user_id INTEGER PRIMARY KEY)")
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                balance INTEGER DEFAULT 0,
-                refs INTEGER DEFAULT 0,
-                referred_by INTEGER,
-                status TEXT DEFAULT 'MEHMON',
-                pending_deposit INTEGER DEFAULT 0,
-                pending_status TEXT,
-                first_deposit_done INTEGER DEFAULT 0
-            )
-            """
-        )
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS mandatory_channels (channel_id TEXT PRIMARY KEY)"
-        )
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS bonus_channels (channel_id TEXT PRIMARY KEY, bonus INTEGER)"
-        )
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS promos (code TEXT PRIMARY KEY, amount INTEGER, limit_count INTEGER)"
-        )
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS promo_history (user_id INTEGER, code TEXT)"
-        )
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS bonus_history (user_id INTEGER, channel_id TEXT)"
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS withdrawals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                amount INTEGER,
-                card_text TEXT,
-                status TEXT DEFAULT 'pending'
-            )
-            """
-        )
-        conn.commit()
-
-
-def add_user(user_id: int, referrer_id: int | None = None) -> None:
-    with get_db() as conn:
-        conn.execute(
-            "INSERT OR IGNORE INTO users (user_id, referred_by) VALUES (?, ?)",
-            (user_id, referrer_id),
-        )
-        conn.commit()
-
-
-def get_user(user_id: int) -> sqlite3.Row | None:
-    with get_db() as conn:
-        return conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
-
-
-def add_admin(user_id: int) -> None:
-    with get_db() as conn:
-        conn.execute("INSERT OR IGNORE INTO admins (user_id) VALUES (?)", (user_id,))
-        conn.commit()
-
-
-def remove_admin(user_id: int) -> None:
-    with get_db() as conn:
-        conn.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
-        conn.commit()
-
-
-def is_admin(user_id: int) -> bool:
-    with get_db() as conn:
-        row = conn.execute("SELECT 1 FROM admins WHERE user_id = ?", (user_id,)).fetchone()
-        return row is not None
-
-
-def set_pending_deposit(user_id: int, amount: int, status: str) -> None:
-    with get_db() as conn:
-        conn.execute(
-            "UPDATE users SET pending_deposit = ?, pending_status = ? WHERE user_id = ?",
-            (amount, status, user_id),
-        )
-        conn.commit()
-
-
-def confirm_deposit(user_id: int) -> sqlite3.Row | None:
-    with get_db() as conn:
-        user = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
-        if not user or user["pending_deposit"] <= 0:
-            return None
-        conn.execute(
-            "UPDATE users SET balance = balance + ?, pending_deposit = 0, pending_status = NULL "
-            "WHERE user_id = ?",
-            (user["pending_deposit"], user_id),
-        )
-        conn.commit()
-        return user
-
-
-def mark_first_deposit(user_id: int, status: str) -> None:
-    with get_db() as conn:
-        conn.execute(
-            "UPDATE users SET first_deposit_done = 1, status = ?, pending_status = NULL WHERE user_id = ?",
-            (status, user_id),
-        )
-        conn.commit()
+import asyncio
+import csv
+import functools
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterator, TypeVar
+
+import config
+import sqltrace
+from cache import menus, users as user_cache
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = config.DB_PATH
+
+T = TypeVar("T")
+
+# All SQLite work runs off the event loop. Reads use a small pool of
+# threads; writes are queued to a single writer thread that commits every
+# write arriving within DB_WRITE_BATCH_MS in one transaction. Each thread
+# keeps one long-lived connection; WAL lets readers run while it commits.
+_executor = ThreadPoolExecutor(max_workers=config.DB_POOL_SIZE, thread_name_prefix="sqlite")
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+_write_queue: asyncio.Queue | None = None
+_writer_task: asyncio.Task | None = None
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+
+# Admin IDs are read on every admin callback, so they live in memory and are
+# swapped in with one assignment. meta.admins_version is bumped by triggers on
+# every change, so other processes sharing the database notice edits through
+# refresh_registries().
+_admins_version = -1
+_admin_ids: frozenset[int] = frozenset()
+_admins_lock = threading.Lock()
+
+# Mandatory and bonus channels work the same way, stamped by
+# meta.channels_version.
+_channels_version = -1
+_mandatory_channels: tuple[str, ...] = ()
+_bonus_channels: tuple[sqlite3.Row, ...] = ()
+_channels_lock = threading.Lock()
+
+# Keyset pagination cursor: (">", key) is the page after key, ("<", key) the
+# page before it.
+Cursor = tuple[str, int]
+FIRST_PAGE: Cursor = (">", 0)
+
+# Tables admins can export, each streamed in key order.
+EXPORT_QUERIES = {
+    "users": "SELECT * FROM users ORDER BY user_id",
+    "deposits": (
+        "SELECT id, user_id, tariff, amount, status, created_at, updated_at "
+        "FROM deposits ORDER BY id"
+    ),
+    "withdrawals": "SELECT * FROM withdrawals ORDER BY id",
+    "promo_history": "SELECT rowid AS id, user_id, code FROM promo_history ORDER BY rowid",
+    "bonus_history": "SELECT rowid AS id, user_id, channel_id FROM bonus_history ORDER BY rowid",
+}
+EXPORT_CHUNK_ROWS = 5000
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}",
+)
+
+
+def db_call(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+    return wrapper
+
+
+def db_write(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        global _write_queue, _writer_task
+        if _writer_task is None:
+            _write_queue = asyncio.Queue()
+            _writer_task = asyncio.create_task(_writer_loop())
+        future = asyncio.get_running_loop().create_future()
+        _write_queue.put_nowait((functools.partial(func, *args, **kwargs), future))
+        return await future
+
+    return wrapper
+
+
+async def _writer_loop() -> None:
+    loop = asyncio.get_running_loop()
+    running = True
+    while running:
+        batch = [await _write_queue.get()]
+        if config.DB_WRITE_BATCH_MS > 0:
+            await asyncio.sleep(config.DB_WRITE_BATCH_MS / 1000)
+        while len(batch) < config.DB_WRITE_BATCH_SIZE and not _write_queue.empty():
+            batch.append(_write_queue.get_nowait())
+        if None in batch:
+            running = False
+            batch = [item for item in batch if item is not None]
+        if not batch:
+            continue
+        try:
+            results = await loop.run_in_executor(
+                _write_executor, _run_batch, [op for op, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        for (_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+def _run_batch(ops: list[Callable[[], Any]]) -> list[tuple[bool, Any]]:
+    results = []
+    with transaction():
+        for op in ops:
+            # Each operation gets its own savepoint, so a failing write is
+            # rolled back without aborting the rest of the batch.
+            try:
+                with transaction():
+                    results.append((True, op()))
+            except Exception as e:
+                results.append((False, e))
+    return results
+
+
+def connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        factory=sqltrace.TracingConnection if config.SQL_TRACE else sqlite3.Connection,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_db() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = connect()
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    # BEGIN IMMEDIATE takes the write lock up front, so the checks made inside
+    # the block cannot be invalidated by another writer before the commit.
+    # Nested blocks (e.g. one write inside a batch) become savepoints. Raise
+    # Rollback to undo the block without propagating an error.
+    conn = get_db()
+    depth = getattr(_local, "depth", 0)
+    if depth == 0:
+        _local.callbacks = []
+        conn.execute("BEGIN IMMEDIATE")
+    else:
+        conn.execute(f"SAVEPOINT sp{depth}")
+    mark = len(_local.callbacks)
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException as e:
+        if depth == 0:
+            conn.rollback()
+        else:
+            conn.execute(f"ROLLBACK TO sp{depth}")
+            conn.execute(f"RELEASE sp{depth}")
+        del _local.callbacks[mark:]
+        if not isinstance(e, Rollback):
+            raise
+    else:
+        if depth == 0:
+            try:
+                conn.commit()
+            except BaseException:
+                # A failed COMMIT (deferred constraint, disk full, busy) leaves
+                # the transaction open; close it so the next write can begin.
+                conn.rollback()
+                _local.callbacks = []
+                raise
+            callbacks, _local.callbacks = _local.callbacks, []
+            for callback in callbacks:
+                callback()
+        else:
+            conn.execute(f"RELEASE sp{depth}")
+    finally:
+        _local.depth = depth
+
+
+def on_commit(callback: Callable[[], None]) -> None:
+    if getattr(_local, "depth", 0):
+        _local.callbacks.append(callback)
+    else:
+        callback()
+
+
+async def close_db() -> None:
+    if _writer_task is not None:
+        _write_queue.put_nowait(None)
+        await _writer_task
+    await asyncio.to_thread(_write_executor.shutdown, wait=True)
+    await asyncio.to_thread(_executor.shutdown, wait=True)
+    if config.SQL_TRACE and _connections:
+        logger.info("SQL trace:\n%s", sqltrace.report(_connections[0]))
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+
+
+@dataclass
+class Page:
+    rows: list[sqlite3.Row]
+    has_prev: bool
+    has_next: bool
+
+    @property
+    def first_key(self) -> int:
+        return self.rows[0]["key"]
+
+    @property
+    def last_key(self) -> int:
+        return self.rows[-1]["key"]
+
+
+def _keyset_page(
+    conn: sqlite3.Connection,
+    columns: str,
+    table: str,
+    where: str,
+    key: str,
+    cursor: Cursor,
+    params: tuple = (),
+) -> Page:
+    direction, value = cursor
+    if direction not in (">", "<"):
+        raise ValueError(f"Invalid page direction: {direction}")
+    order = "ASC" if direction == ">" else "DESC"
+    rows = conn.execute(
+        f"SELECT {key} AS key, {columns} FROM {table} "
+        f"WHERE {where} AND {key} {direction} ? ORDER BY {key} {order} LIMIT ?",
+        (*params, value, config.ADMIN_PAGE_SIZE + 1),
+    ).fetchall()
+    more = len(rows) > config.ADMIN_PAGE_SIZE
+    rows = rows[: config.ADMIN_PAGE_SIZE]
+    if not rows:
+        if cursor != FIRST_PAGE:
+            return _keyset_page(conn, columns, table, where, key, FIRST_PAGE, params)
+        return Page([], False, False)
+    if direction == "<":
+        rows.reverse()
+
+    def exists(op: str, bound: int) -> bool:
+        row = conn.execute(
+            f"SELECT 1 FROM {table} WHERE {where} AND {key} {op} ? LIMIT 1",
+            (*params, bound),
+        ).fetchone()
+        return row is not None
+
+    if direction == ">":
+        return Page(rows, exists("<", rows[0]["key"]), more)
+    return Page(rows, more, exists(">", rows[-1]["key"]))
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS admins (user_id INTEGER PRIMARY KEY)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            refs INTEGER DEFAULT 0,
+            referred_by INTEGER,
+            status TEXT DEFAULT 'MEHMON',
+            pending_deposit INTEGER DEFAULT 0,
+            pending_status TEXT,
+            first_deposit_done INTEGER DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS mandatory_channels (channel_id TEXT PRIMARY KEY)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS bonus_channels (channel_id TEXT PRIMARY KEY, bonus INTEGER)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS promos (code TEXT PRIMARY KEY, amount INTEGER, limit_count INTEGER)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS promo_history (user_id INTEGER, code TEXT)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS bonus_history (user_id INTEGER, channel_id TEXT)"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS withdrawals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            amount INTEGER,
+            card_text TEXT,
+            status TEXT DEFAULT 'pending'
+        )
+        """
+    )
+
+
+def _add_blocked_flag(conn: sqlite3.Connection) -> None:
+    _ensure_column(conn, "users", "blocked", "INTEGER DEFAULT 0")
+
+
+def _add_indexes(conn: sqlite3.Connection) -> None:
+    # Older databases may contain duplicate redemptions; keep the first one so
+    # the unique indexes can be built.
+    conn.execute(
+        "DELETE FROM promo_history WHERE rowid NOT IN "
+        "(SELECT MIN(rowid) FROM promo_history GROUP BY user_id, code)"
+    )
+    conn.execute(
+        "DELETE FROM bonus_history WHERE rowid NOT IN "
+        "(SELECT MIN(rowid) FROM bonus_history GROUP BY user_id, channel_id)"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS promo_history_user_code "
+        "ON promo_history (user_id, code)"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS bonus_history_user_channel "
+        "ON bonus_history (user_id, channel_id)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS withdrawals_status ON withdrawals (status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS users_referred_by ON users (referred_by)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS users_pending_deposit "
+        "ON users (user_id, pending_deposit, pending_status) WHERE pending_deposit > 0"
+    )
+
+
+def _add_stats(conn: sqlite3.Connection) -> None:
+    # Aggregates for the admin statistics view, kept up to date by triggers in
+    # the same transaction as the row changes so reading them is O(1).
+    conn.execute("CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT PRIMARY KEY,
+            signups INTEGER NOT NULL DEFAULT 0,
+            deposits INTEGER NOT NULL DEFAULT 0,
+            deposits_amount INTEGER NOT NULL DEFAULT 0,
+            withdrawals INTEGER NOT NULL DEFAULT 0,
+            withdrawals_amount INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO stats (key, value)
+        SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'balance', COALESCE(SUM(balance), 0) FROM users
+        UNION ALL SELECT 'pending_deposit', COALESCE(SUM(pending_deposit), 0) FROM users
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_stats_insert AFTER INSERT ON users BEGIN
+            UPDATE stats SET value = value + 1 WHERE key = 'users';
+            UPDATE stats SET value = value + COALESCE(new.balance, 0) WHERE key = 'balance';
+            UPDATE stats SET value = value + COALESCE(new.pending_deposit, 0)
+                WHERE key = 'pending_deposit';
+            INSERT INTO daily_stats (day, signups) VALUES (date('now'), 1)
+                ON CONFLICT (day) DO UPDATE SET signups = signups + 1;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_stats_delete AFTER DELETE ON users BEGIN
+            UPDATE stats SET value = value - 1 WHERE key = 'users';
+            UPDATE stats SET value = value - COALESCE(old.balance, 0) WHERE key = 'balance';
+            UPDATE stats SET value = value - COALESCE(old.pending_deposit, 0)
+                WHERE key = 'pending_deposit';
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_stats_update
+        AFTER UPDATE OF balance, pending_deposit ON users BEGIN
+            UPDATE stats SET value = value + COALESCE(new.balance, 0) - COALESCE(old.balance, 0)
+                WHERE key = 'balance';
+            UPDATE stats
+                SET value = value + COALESCE(new.pending_deposit, 0) - COALESCE(old.pending_deposit, 0)
+                WHERE key = 'pending_deposit';
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_deposit_confirmed
+        AFTER UPDATE OF pending_deposit ON users
+        WHEN old.pending_deposit > 0 AND new.pending_deposit = 0 BEGIN
+            INSERT INTO daily_stats (day, deposits, deposits_amount)
+                VALUES (date('now'), 1, old.pending_deposit)
+                ON CONFLICT (day) DO UPDATE SET
+                    deposits = deposits + 1,
+                    deposits_amount = deposits_amount + excluded.deposits_amount;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS withdrawals_done
+        AFTER UPDATE OF status ON withdrawals
+        WHEN new.status = 'done' AND old.status != 'done' BEGIN
+            INSERT INTO daily_stats (day, withdrawals, withdrawals_amount)
+                VALUES (date('now'), 1, new.amount)
+                ON CONFLICT (day) DO UPDATE SET
+                    withdrawals = withdrawals + 1,
+                    withdrawals_amount = withdrawals_amount + excluded.withdrawals_amount;
+        END
+        """
+    )
+
+
+def _add_fsm_states(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL DEFAULT '{}',
+            updated_at INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS fsm_states_updated_at ON fsm_states (updated_at)")
+
+
+def _add_deposits(conn: sqlite3.Connection) -> None:
+    # Pending deposits move from users.pending_* into their own table. The old
+    # triggers that derived deposit stats from users are replaced first so the
+    # move itself is not counted as confirmations.
+    conn.execute("DROP TRIGGER IF EXISTS users_deposit_confirmed")
+    conn.execute("DROP TRIGGER IF EXISTS users_stats_update")
+    conn.execute("DROP INDEX IF EXISTS users_pending_deposit")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS deposits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            tariff TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            photo_file_id TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            updated_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS deposits_status ON deposits (status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS deposits_user_status ON deposits (user_id, status)")
+    conn.execute(
+        "INSERT INTO deposits (user_id, tariff, amount) "
+        "SELECT user_id, COALESCE(pending_status, ''), pending_deposit FROM users "
+        "WHERE pending_deposit > 0"
+    )
+    conn.execute(
+        "UPDATE users SET pending_deposit = 0, pending_status = NULL WHERE pending_deposit > 0"
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_stats_update AFTER UPDATE OF balance ON users BEGIN
+            UPDATE stats SET value = value + COALESCE(new.balance, 0) - COALESCE(old.balance, 0)
+                WHERE key = 'balance';
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS deposits_stats_insert AFTER INSERT ON deposits
+        WHEN new.status = 'pending' BEGIN
+            UPDATE stats SET value = value + new.amount WHERE key = 'pending_deposit';
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS deposits_stats_update AFTER UPDATE OF status ON deposits
+        WHEN old.status = 'pending' AND new.status != 'pending' BEGIN
+            UPDATE stats SET value = value - old.amount WHERE key = 'pending_deposit';
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS deposits_confirmed AFTER UPDATE OF status ON deposits
+        WHEN new.status = 'confirmed' AND old.status != 'confirmed' BEGIN
+            INSERT INTO daily_stats (day, deposits, deposits_amount)
+                VALUES (date('now'), 1, new.amount)
+                ON CONFLICT (day) DO UPDATE SET
+                    deposits = deposits + 1,
+                    deposits_amount = deposits_amount + excluded.deposits_amount;
+        END
+        """
+    )
+    conn.execute(
+        "UPDATE stats SET value = "
+        "(SELECT COALESCE(SUM(amount), 0) FROM deposits WHERE status = 'pending') "
+        "WHERE key = 'pending_deposit'"
+    )
+
+
+def _add_meta(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('channels_version', 0)")
+    for table in ("mandatory_channels", "bonus_channels"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version
+                AFTER {event} ON {table} BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'channels_version';
+                END
+                """
+            )
+
+
+def _add_admins_version(conn: sqlite3.Connection) -> None:
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('admins_version', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS admins_{event.lower()}_version
+            AFTER {event} ON admins BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'admins_version';
+            END
+            """
+        )
+
+
+# Schema migrations, applied in order. The number of applied migrations is
+# stored in PRAGMA user_version; append new steps, never edit old ones.
+MIGRATIONS: list[Callable[[sqlite3.Connection], None]] = [
+    _initial_schema,
+    _add_blocked_flag,
+    _add_indexes,
+    _add_stats,
+    _add_fsm_states,
+    _add_deposits,
+    _add_meta,
+    _add_admins_version,
+]
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+            continue
+        # Re-check under the write lock so several processes starting at once
+        # apply each step exactly once.
+        with transaction():
+            if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+
+
+@db_call
+def init_db() -> None:
+    conn = get_db()
+    migrate(conn)
+    _load_admins(conn)
+    _load_channels(conn)
+
+
+@db_write
+def add_user(user_id: int, referrer_id: int | None = None) -> None:
+    with transaction() as conn:
+        user = conn.execute(
+            "INSERT INTO users (user_id, referred_by) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET blocked = 0 WHERE blocked = 1 RETURNING *",
+            (user_id, referrer_id),
+        ).fetchone()
+        _cache_user(user)
+
+
+@db_call
+def _read_user(user_id: int) -> sqlite3.Row | None:
+    with get_db() as conn:
+        return conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+
+
+async def get_user(user_id: int) -> sqlite3.Row | None:
+    user = user_cache.get(user_id)
+    if user is None:
+        generation = user_cache.generation
+        user = await _read_user(user_id)
+        if user is not None:
+            user_cache.fill(user_id, user, generation)
+    return user
+
+
+def _cache_user(user: sqlite3.Row | None) -> None:
+    if user is not None:
+        on_commit(functools.partial(user_cache.put, user["user_id"], user))
+
+
+@db_call
+def count_recipients() -> int:
+    with get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM users WHERE blocked = 0").fetchone()[0]
+
+
+@db_call
+def get_recipients_after(after_user_id: int, limit: int) -> list[int]:
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT user_id FROM users WHERE user_id > ? AND blocked = 0 ORDER BY user_id LIMIT ?",
+            (after_user_id, limit),
+        )
+        return [row[0] for row in rows]
+
+
+@db_write
+def mark_blocked(user_ids: list[int]) -> None:
+    with transaction() as conn:
+        conn.executemany(
+            "UPDATE users SET blocked = 1 WHERE user_id = ?",
+            [(user_id,) for user_id in user_ids],
+        )
+        for user_id in user_ids:
+            on_commit(functools.partial(user_cache.invalidate, user_id))
+
+
+@db_call
+def get_stats() -> dict[str, int]:
+    with get_db() as conn:
+        stats = {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM stats")}
+        today = conn.execute(
+            "SELECT signups, deposits, deposits_amount, withdrawals, withdrawals_amount "
+            "FROM daily_stats WHERE day = date('now')"
+        ).fetchone()
+        for key in ("signups", "deposits", "deposits_amount", "withdrawals", "withdrawals_amount"):
+            stats[key] = today[key] if today else 0
+        return stats
+
+
+def _load_admins(conn: sqlite3.Connection) -> None:
+    global _admins_version, _admin_ids
+    with _admins_lock:
+        version = _meta_version(conn, "admins_version")
+        _admin_ids = frozenset(row[0] for row in conn.execute("SELECT user_id FROM admins"))
+        _admins_version = version
+
+
+def _reload_admins() -> None:
+    _load_admins(get_db())
+
+
+@db_write
+def add_admin(user_id: int) -> None:
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO admins (user_id) VALUES (?)", (user_id,))
+        on_commit(_reload_admins)
+
+
+@db_write
+def remove_admin(user_id: int) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
+        on_commit(_reload_admins)
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in _admin_ids
+
+
+def get_admin_ids() -> frozenset[int]:
+    return _admin_ids
+
+
+@db_call
+def get_admins_page(cursor: Cursor = FIRST_PAGE) -> Page:
+    with get_db() as conn:
+        return _keyset_page(conn, "user_id", "admins", "1", "user_id", cursor)
+
+
+def _meta_version(conn: sqlite3.Connection, key: str) -> int:
+    return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+
+def _load_channels(conn: sqlite3.Connection) -> None:
+    global _channels_version, _mandatory_channels, _bonus_channels
+    with _channels_lock:
+        # Read the stamp first: a change landing mid-load only costs one extra reload.
+        version = _meta_version(conn, "channels_version")
+        _mandatory_channels = tuple(
+            row[0]
+            for row in conn.execute("SELECT channel_id FROM mandatory_channels ORDER BY rowid")
+        )
+        _bonus_channels = tuple(conn.execute("SELECT * FROM bonus_channels ORDER BY rowid"))
+        _channels_version = version
+        menus.invalidate("bonus")
+
+
+def _reload_channels() -> None:
+    _load_channels(get_db())
+
+
+@db_call
+def refresh_registries() -> None:
+    conn = get_db()
+    if _meta_version(conn, "admins_version") != _admins_version:
+        _load_admins(conn)
+    if _meta_version(conn, "channels_version") != _channels_version:
+        _load_channels(conn)
+
+
+async def watch_registries(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        # A failed refresh (e.g. locked past the busy timeout) is retried on
+        # the next tick instead of ending the watcher.
+        try:
+            await refresh_registries()
+        except sqlite3.Error as e:
+            logger.warning("Registry refresh failed: %s", e)
+
+
+def get_mandatory_channels() -> tuple[str, ...]:
+    return _mandatory_channels
+
+
+@db_call
+def get_mandatory_channels_page(cursor: Cursor = FIRST_PAGE) -> Page:
+    with get_db() as conn:
+        return _keyset_page(conn, "channel_id", "mandatory_channels", "1", "rowid", cursor)
+
+
+@db_write
+def add_mandatory_channel(channel_id: str) -> None:
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO mandatory_channels VALUES (?)", (channel_id,))
+        on_commit(_reload_channels)
+
+
+@db_write
+def remove_mandatory_channel(channel_id: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM mandatory_channels WHERE channel_id = ?", (channel_id,))
+        on_commit(_reload_channels)
+
+
+def get_bonus_channels() -> tuple[sqlite3.Row, ...]:
+    return _bonus_channels
+
+
+@db_write
+def add_bonus_channel(channel_id: str, bonus: int) -> None:
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO bonus_channels VALUES (?, ?)", (channel_id, bonus))
+        on_commit(_reload_channels)
+
+
+@db_write
+def remove_bonus_channel(channel_id: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM bonus_channels WHERE channel_id = ?", (channel_id,))
+        on_commit(_reload_channels)
+
+
+@db_call
+def has_bonus(user_id: int, channel_id: str) -> bool:
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM bonus_history WHERE user_id = ? AND channel_id = ?",
+            (user_id, channel_id),
+        ).fetchone()
+        return row is not None
+
+
+@db_write
+def claim_bonus(user_id: int, channel_id: str) -> int | None:
+    with transaction() as conn:
+        channel = conn.execute(
+            "SELECT bonus FROM bonus_channels WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+        if channel is None:
+            return None
+        claimed = conn.execute(
+            "INSERT INTO bonus_history (user_id, channel_id) VALUES (?, ?) ON CONFLICT DO NOTHING",
+            (user_id, channel_id),
+        ).rowcount
+        if not claimed:
+            return None
+        user = conn.execute(
+            "UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING *",
+            (channel["bonus"], user_id),
+        ).fetchone()
+        _cache_user(user)
+        return channel["bonus"]
+
+
+@db_call
+def get_promos_page(cursor: Cursor = FIRST_PAGE) -> Page:
+    with get_db() as conn:
+        return _keyset_page(conn, "code, amount, limit_count", "promos", "1", "rowid", cursor)
+
+
+@db_write
+def add_promo(code: str, amount: int, limit_count: int) -> None:
+    with transaction() as conn:
+        conn.execute("INSERT INTO promos VALUES (?, ?, ?)", (code, amount, limit_count))
+
+
+@db_write
+def remove_promo(code: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM promos WHERE code = ?", (code,))
+
+
+@db_write
+def redeem_promo(user_id: int, code: str) -> int | None:
+    with transaction() as conn:
+        claimed = conn.execute(
+            "INSERT INTO promo_history (user_id, code) VALUES (?, ?) ON CONFLICT DO NOTHING",
+            (user_id, code),
+        ).rowcount
+        if not claimed:
+            return None
+        promo = conn.execute(
+            "UPDATE promos SET limit_count = limit_count - 1 "
+            "WHERE code = ? AND limit_count > 0 RETURNING amount",
+            (code,),
+        ).fetchone()
+        if promo is None:
+            raise Rollback
+        user = conn.execute(
+            "UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING *",
+            (promo["amount"], user_id),
+        ).fetchone()
+        _cache_user(user)
+        return promo["amount"]
+    return None
+
+
+@db_write
+def create_deposit(user_id: int, tariff: str, amount: int, photo_file_id: str) -> int:
+    with transaction() as conn:
+        return conn.execute(
+            "INSERT INTO deposits (user_id, tariff, amount, photo_file_id) VALUES (?, ?, ?, ?)",
+            (user_id, tariff, amount, photo_file_id),
+        ).lastrowid
+
+
+@db_call
+def get_pending_deposits_page(cursor: Cursor = FIRST_PAGE) -> Page:
+    with get_db() as conn:
+        return _keyset_page(
+            conn,
+            "id, user_id, tariff, amount",
+            "deposits",
+            "status = 'pending'",
+            "id",
+            cursor,
+        )
+
+
+# Used by "approve this page": only rows from first to last, with no fallback
+# to another page, so nothing the admin did not see gets approved.
+@db_call
+def get_pending_deposit_ids_between(first: int, last: int) -> list[int]:
+    with get_db() as conn:
+        return [
+            row[0]
+            for row in conn.execute(
+                "SELECT id FROM deposits WHERE status = 'pending' AND id BETWEEN ? AND ? "
+                "ORDER BY id",
+                (first, last),
+            )
+        ]
+
+
+@db_call
+def get_deposit(deposit_id: int) -> sqlite3.Row | None:
+    with get_db() as conn:
+        return conn.execute(
+            "SELECT id, user_id, tariff, amount, photo_file_id, status FROM deposits WHERE id = ?",
+            (deposit_id,),
+        ).fetchone()
+
+
+@db_call
+def get_oldest_pending_deposit_id(user_id: int) -> int | None:
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT id FROM deposits WHERE user_id = ? AND status = 'pending' ORDER BY id LIMIT 1",
+            (user_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+
+def _confirm_deposit(conn: sqlite3.Connection, deposit_id: int) -> sqlite3.Row | None:
+    deposit = conn.execute(
+        "UPDATE deposits SET status = 'confirmed', "
+        "updated_at = CAST(strftime('%s', 'now') AS INTEGER) "
+        "WHERE id = ? AND status = 'pending' RETURNING id, user_id, tariff, amount",
+        (deposit_id,),
+    ).fetchone()
+    if not deposit:
+        return None
+    user = conn.execute(
+        "UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING *",
+        (deposit["amount"], deposit["user_id"]),
+    ).fetchone()
+    if user and user["first_deposit_done"] == 0 and deposit["tariff"] in config.TARIFFS:
+        if user["referred_by"]:
+            referrer = conn.execute(
+                "UPDATE users SET balance = balance + ?, refs = refs + 1 WHERE user_id = ? "
+                "RETURNING *",
+                (config.TARIFFS[deposit["tariff"]]["ref_bonus"], user["referred_by"]),
+            ).fetchone()
+            _cache_user(referrer)
+        user = conn.execute(
+            "UPDATE users SET balance = balance + ?, first_deposit_done = 1, status = ? "
+            "WHERE user_id = ? RETURNING *",
+            (max(config.FIRST_DEPOSIT_BONUS, 0), deposit["tariff"], deposit["user_id"]),
+        ).fetchone()
+    _cache_user(user)
+    return deposit
+
+
+@db_write
+def confirm_deposit(deposit_id: int) -> sqlite3.Row | None:
+    with transaction() as conn:
+        return _confirm_deposit(conn, deposit_id)
+
+
+@db_write
+def confirm_deposits(deposit_ids: list[int]) -> list[sqlite3.Row]:
+    with transaction() as conn:
+        return [
+            deposit
+            for deposit_id in deposit_ids
+            if (deposit := _confirm_deposit(conn, deposit_id)) is not None
+        ]
+
+
+@db_write
+def create_withdrawal(user_id: int, amount: int, card_text: str) -> int:
+    with transaction() as conn:
+        return conn.execute(
+            "INSERT INTO withdrawals (user_id, amount, card_text) VALUES (?, ?, ?)",
+            (user_id, amount, card_text),
+        ).lastrowid
+
+
+@db_call
+def get_pending_withdrawals_page(cursor: Cursor = FIRST_PAGE) -> Page:
+    with get_db() as conn:
+        return _keyset_page(
+            conn,
+            "id, user_id, amount, card_text",
+            "withdrawals",
+            "status = 'pending'",
+            "id",
+            cursor,
+        )
+
+
+@db_call
+def get_pending_withdrawal_ids_between(first: int, last: int) -> list[int]:
+    with get_db() as conn:
+        return [
+            row[0]
+            for row in conn.execute(
+                "SELECT id FROM withdrawals WHERE status = 'pending' AND id BETWEEN ? AND ? "
+                "ORDER BY id",
+                (first, last),
+            )
+        ]
+
+
+def _confirm_withdrawal(conn: sqlite3.Connection, req_id: int) -> sqlite3.Row | None:
+    with transaction():
+        row = conn.execute(
+            "UPDATE withdrawals SET status = 'done' WHERE id = ? AND status = 'pending' "
+            "RETURNING id, user_id, amount",
+            (req_id,),
+        ).fetchone()
+        if not row:
+            return None
+        user = conn.execute(
+            "UPDATE users SET balance = balance - ? WHERE user_id = ? AND balance >= ? "
+            "RETURNING *",
+            (row["amount"], row["user_id"], row["amount"]),
+        ).fetchone()
+        if user is None:
+            # The balance was spent since the request was made; leave it pending.
+            raise Rollback
+        _cache_user(user)
+        return row
+    return None
+
+
+@db_write
+def confirm_withdrawals(req_ids: list[int]) -> list[sqlite3.Row]:
+    with transaction() as conn:
+        return [row for req_id in req_ids if (row := _confirm_withdrawal(conn, req_id)) is not None]
+
+
+@db_call
+def get_fsm_record(key: str, not_before: int) -> sqlite3.Row | None:
+    with get_db() as conn:
+        return conn.execute(
+            "SELECT state, data FROM fsm_states WHERE key = ? AND updated_at >= ?",
+            (key, not_before),
+        ).fetchone()
+
+
+@db_write
+def save_fsm_record(key: str, state: str | None, data: str) -> None:
+    with transaction() as conn:
+        if state is None and data == "{}":
+            conn.execute("DELETE FROM fsm_states WHERE key = ?", (key,))
+        else:
+            conn.execute(
+                "INSERT INTO fsm_states (key, state, data, updated_at) "
+                "VALUES (?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER)) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "state = excluded.state, data = excluded.data, updated_at = excluded.updated_at",
+                (key, state, data),
+            )
+
+
+@db_write
+def delete_expired_fsm_records(before: int) -> int:
+    with transaction() as conn:
+        return conn.execute("DELETE FROM fsm_states WHERE updated_at < ?", (before,)).rowcount
+
+
+# Runs on a reader thread: rows are pulled EXPORT_CHUNK_ROWS at a time and
+# written straight into the gzip file, so memory stays flat however big the
+# table is and the event loop never sees the rows. The single SELECT reads
+# one WAL snapshot, so the file is consistent even while writes continue.
+@db_call
+def export_table(table: str, fmt: str, path: str) -> int:
+    count = 0
+    with get_db() as conn, gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="") as f:
+        cursor = conn.execute(EXPORT_QUERIES[table])
+        columns = [column[0] for column in cursor.description]
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+        while rows := cursor.fetchmany(EXPORT_CHUNK_ROWS):
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                f.writelines(
+                    json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows
+                )
+            count += len(rows)
+    return count
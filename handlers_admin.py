@@ -1,555 +1,756 @@
-from aiogram import Bot, F, Router
-from aiogram.filters import Command
-from aiogram.fsm.context import FSMContext
-from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
-
-import config
-from database import add_admin, confirm_deposit, get_db, is_admin, mark_first_deposit, remove_admin
-
-router = Router()
-
-
-class AdminStates(StatesGroup):
-    wait_broadcast = State()
-    wait_mand_add = State()
-    wait_mand_del = State()
-    wait_bonus_add = State()
-    wait_bonus_del = State()
-    wait_promo_add = State()
-    wait_promo_del = State()
-    wait_confirm_deposit = State()
-    wait_confirm_withdraw = State()
-    wait_add_admin = State()
-    wait_del_admin = State()
-
-
-def has_admin_access(user_id: int) -> bool:
-    return user_id == config.ADMIN_ID or is_admin(user_id)
-
-
-admin_kb = InlineKeyboardMarkup(
-    inline_keyboard=[
-        [InlineKeyboardButton(text="📊 Statistika", callback_data="admin_stats")],
-        [InlineKeyboardButton(text="📢 Majburiy kanallar", callback_data="admin_mandatory")],
-        [InlineKeyboardButton(text="🎁 Bonus kanallar", callback_data="admin_bonus")],
-        [InlineKeyboardButton(text="💳 Depozitlar", callback_data="admin_deposits")],
-        [InlineKeyboardButton(text="💸 Pul yechish", callback_data="admin_withdraws")],
-        [InlineKeyboardButton(text="🏷 Promokodlar", callback_data="admin_promos")],
-        [InlineKeyboardButton(text="👤 Adminlar", callback_data="admin_staff")],
-        [InlineKeyboardButton(text="📣 Reklama yuborish", callback_data="admin_broadcast")],
-    ]
-)
-
-
-@router.message(Command("admin"))
-async def admin_panel(msg: Message) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    await msg.answer(
-        "🛠 <b>ADMIN PANEL</b>\n\nBoshqaruv bo‘limini tanlang 👇",
-        reply_markup=admin_kb,
-        parse_mode="HTML",
-    )
-
-
-@router.message(F.text == "🛠 Admin panel")
-async def admin_panel_button(msg: Message) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    await admin_panel(msg)
-
-
-@router.callback_query(F.data == "admin_stats")
-async def admin_stats(call: CallbackQuery) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    db = get_db()
-    u_count = db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
-    total_bal = db.execute("SELECT SUM(balance) FROM users").fetchone()[0] or 0
-    total_pending = (
-        db.execute("SELECT SUM(pending_deposit) FROM users").fetchone()[0] or 0
-    )
-    text = (
-        "📊 <b>STATISTIKA</b>\n\n"
-        f"👥 Foydalanuvchilar: {u_count}\n"
-        f"💰 Jami balanslar: {total_bal:,} so'm\n"
-        f"⏳ Kutilayotgan depozitlar: {total_pending:,} so'm"
-    )
-    await call.message.edit_text(text, reply_markup=admin_kb, parse_mode="HTML")
-
-
-@router.callback_query(F.data == "admin_mandatory")
-async def mandatory_list(call: CallbackQuery) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    db = get_db()
-    rows = db.execute("SELECT * FROM mandatory_channels").fetchall()
-    text = "📢 <b>Majburiy kanallar:</b>\n\n"
-    for r in rows:
-        text += f"• <code>{r['channel_id']}</code>\n"
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="➕ Kanal qo'shish", callback_data="mand_add")],
-            [InlineKeyboardButton(text="➖ Kanal o'chirish", callback_data="mand_del")],
-            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
-        ]
-    )
-    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
-
-
-@router.callback_query(F.data == "mand_add")
-async def add_mand_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_mand_add)
-    await call.message.answer("➕ Kanal username yuboring (masalan: @kanal):")
-
-
-@router.callback_query(F.data == "mand_del")
-async def del_mand_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_mand_del)
-    await call.message.answer("➖ O'chiriladigan kanal username yuboring (masalan: @kanal):")
-
-
-@router.message(AdminStates.wait_mand_add)
-async def add_mand(msg: Message, state: FSMContext) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    ch_id = msg.text.strip()
-    db = get_db()
-    db.execute("INSERT OR REPLACE INTO mandatory_channels VALUES (?)", (ch_id,))
-    db.commit()
-    await state.clear()
-    await msg.answer(f"✅ {ch_id} qo'shildi.", reply_markup=admin_kb)
-
-
-@router.message(AdminStates.wait_mand_del)
-async def del_mand(msg: Message, state: FSMContext) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    ch_id = msg.text.strip()
-    db = get_db()
-    db.execute("DELETE FROM mandatory_channels WHERE channel_id=?", (ch_id,))
-    db.commit()
-    await state.clear()
-    await msg.answer(f"🗑 {ch_id} o'chirildi.", reply_markup=admin_kb)
-
-
-@router.callback_query(F.data == "admin_bonus")
-async def bonus_list(call: CallbackQuery) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    db = get_db()
-    rows = db.execute("SELECT * FROM bonus_channels").fetchall()
-    text = "🎁 <b>Bonus kanallar:</b>\n\n"
-    for r in rows:
-        text += f"• {r['channel_id']} ({r['bonus']} so'm)\n"
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="➕ Bonus kanal qo'shish", callback_data="bonus_add")],
-            [InlineKeyboardButton(text="➖ Bonus kanal o'chirish", callback_data="bonus_del")],
-            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
-        ]
-    )
-    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
-
-
-@router.callback_query(F.data == "bonus_add")
-async def add_bonus_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_bonus_add)
-    await call.message.answer("➕ Format: @kanal 500")
-
-
-@router.callback_query(F.data == "bonus_del")
-async def del_bonus_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_bonus_del)
-    await call.message.answer("➖ O'chiriladigan kanal username yuboring (masalan: @kanal):")
-
-
-@router.message(AdminStates.wait_bonus_add)
-async def add_bonus_cmd(msg: Message, state: FSMContext) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    args = msg.text.split()
-    if len(args) < 2:
-        await msg.answer("❌ Format: @kanal 500")
-        return
-    db = get_db()
-    db.execute(
-        "INSERT OR REPLACE INTO bonus_channels VALUES (?, ?)",
-        (args[0], int(args[1])),
-    )
-    db.commit()
-    await state.clear()
-    await msg.answer(f"✅ {args[0]} ({args[1]} so'm) qo'shildi.", reply_markup=admin_kb)
-
-
-@router.message(AdminStates.wait_bonus_del)
-async def del_bonus_cmd(msg: Message, state: FSMContext) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    ch_id = msg.text.strip()
-    db = get_db()
-    db.execute("DELETE FROM bonus_channels WHERE channel_id=?", (ch_id,))
-    db.commit()
-    await state.clear()
-    await msg.answer(f"🗑 {ch_id} o'chirildi.", reply_markup=admin_kb)
-
-
-@router.callback_query(F.data == "admin_promos")
-async def promo_list(call: CallbackQuery) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    db = get_db()
-    rows = db.execute("SELECT * FROM promos").fetchall()
-    text = "🏷 <b>Promokodlar:</b>\n\n"
-    for r in rows:
-        text += f"• <code>{r['code']}</code> | {r['amount']} so'm | {r['limit_count']} ta\n"
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="➕ Promokod qo'shish", callback_data="promo_add")],
-            [InlineKeyboardButton(text="➖ Promokod o'chirish", callback_data="promo_del")],
-            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
-        ]
-    )
-    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
-
-
-@router.callback_query(F.data == "promo_add")
-async def add_promo_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_promo_add)
-    await call.message.answer("➕ Format: CODE SUMMA LIMIT")
-
-
-@router.callback_query(F.data == "promo_del")
-async def del_promo_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_promo_del)
-    await call.message.answer("➖ O'chiriladigan promokod nomini yuboring:")
-
-
-@router.message(AdminStates.wait_promo_add)
-async def add_promo_cmd(msg: Message, state: FSMContext) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    args = msg.text.split()
-    if len(args) < 3:
-        await msg.answer("❌ Format: CODE SUMMA LIMIT")
-        return
-    db = get_db()
-    db.execute(
-        "INSERT INTO promos VALUES (?, ?, ?)",
-        (args[0], int(args[1]), int(args[2])),
-    )
-    db.commit()
-    await state.clear()
-    await msg.answer(f"✅ Promokod {args[0]} yaratildi.", reply_markup=admin_kb)
-
-
-@router.message(AdminStates.wait_promo_del)
-async def del_promo_cmd(msg: Message, state: FSMContext) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    code = msg.text.strip()
-    db = get_db()
-    db.execute("DELETE FROM promos WHERE code = ?", (code,))
-    db.commit()
-    await state.clear()
-    await msg.answer(f"🗑 Promokod {code} o'chirildi.", reply_markup=admin_kb)
-
-
-@router.callback_query(F.data == "admin_deposits")
-async def dep_list(call: CallbackQuery) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    db = get_db()
-    rows = db.execute(
-        "SELECT user_id, pending_deposit, pending_status FROM users WHERE pending_deposit > 0"
-    ).fetchall()
-    text = "💳 <b>Depozitlar:</b>\n"
-
-    if not rows:
-        await call.message.edit_text("Bo'sh", reply_markup=admin_kb, parse_mode="HTML")
-        return
-
-    for r in rows:
-        text += (
-            f"\n🆔 <code>{r['user_id']}</code> | {r['pending_deposit']} so'm"
-            f"\nTarif: {r['pending_status']}\n"
-        )
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Tasdiqlash", callback_data="deposit_confirm_start")],
-            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
-        ]
-    )
-    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
-
-
-@router.callback_query(F.data == "deposit_confirm_start")
-async def confirm_deposit_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_confirm_deposit)
-    await call.message.answer("✅ Tasdiqlash uchun foydalanuvchi ID yuboring:")
-
-
-@router.callback_query(F.data.startswith("adm_ok_"))
-async def confirm_deposit_callback(call: CallbackQuery, bot: Bot) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    user_id = int(call.data.split("_")[2])
-    user = confirm_deposit(user_id)
-    if not user:
-        await call.answer("❌ Depozit topilmadi.", show_alert=True)
-        return
-
-    if user["first_deposit_done"] == 0 and user["pending_status"]:
-        status = user["pending_status"]
-        ref_bonus = config.TARIFFS[status]["ref_bonus"]
-        db = get_db()
-        if user["referred_by"]:
-            db.execute(
-                "UPDATE users SET balance = balance + ?, refs = refs + 1 WHERE user_id = ?",
-                (ref_bonus, user["referred_by"]),
-            )
-        if config.FIRST_DEPOSIT_BONUS > 0:
-            db.execute(
-                "UPDATE users SET balance = balance + ? WHERE user_id = ?",
-                (config.FIRST_DEPOSIT_BONUS, user_id),
-            )
-        db.commit()
-        mark_first_deposit(user_id, status)
-
-    await call.message.edit_caption("✅ Depozit tasdiqlandi.")
-    await bot.send_message(user_id, "✅ Depozitingiz tasdiqlandi, balansingiz yangilandi.")
-
-
-@router.callback_query(F.data == "admin_withdraws")
-async def with_list(call: CallbackQuery) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    db = get_db()
-    rows = db.execute(
-        "SELECT id, user_id, amount, card_text FROM withdrawals WHERE status = 'pending'"
-    ).fetchall()
-    text = "💸 <b>Yechish so'rovlari:</b>\n"
-
-    if not rows:
-        await call.message.edit_text("Bo'sh", reply_markup=admin_kb, parse_mode="HTML")
-        return
-
-    for r in rows:
-        text += (
-            f"\n🆔 <code>{r['user_id']}</code> | {r['amount']} so'm"
-            f"\nKarta: {r['card_text']}\n"
-        )
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Tasdiqlash", callback_data="withdraw_confirm_start")],
-            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
-        ]
-    )
-    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
-
-
-@router.callback_query(F.data == "withdraw_confirm_start")
-async def confirm_withdraw_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_confirm_withdraw)
-    await call.message.answer("✅ Tasdiqlash uchun so'rov ID yuboring:")
-
-
-@router.callback_query(F.data == "admin_broadcast")
-async def broadcast_start(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_broadcast)
-    await call.message.answer("📣 Reklama xabarini yuboring (Rasm, Video yoki Matn):")
-
-
-@router.message(AdminStates.wait_broadcast)
-async def broadcast_finish(msg: Message, state: FSMContext, bot: Bot) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    db = get_db()
-    users = db.execute("SELECT user_id FROM users").fetchall()
-    count = 0
-    for u in users:
-        try:
-            await msg.copy_to(u[0])
-            count += 1
-        except Exception:
-            continue
-    await state.clear()
-    await msg.answer(f"✅ {count} kishiga yuborildi.", reply_markup=admin_kb)
-
-
-@router.callback_query(F.data == "admin_staff")
-async def admin_staff(call: CallbackQuery) -> None:
-    if not has_admin_access(call.from_user.id):
-        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
-        return
-    db = get_db()
-    rows = db.execute("SELECT user_id FROM admins").fetchall()
-    text = "👤 <b>Adminlar ro'yxati:</b>\n\n"
-    for r in rows:
-        text += f"• <code>{r['user_id']}</code>\n"
-    if not rows:
-        text += "Hozircha qo'shimcha admin yo'q.\n"
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="➕ Admin qo'shish", callback_data="admin_add")],
-            [InlineKeyboardButton(text="➖ Admin o'chirish", callback_data="admin_del")],
-            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
-        ]
-    )
-    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
-
-
-@router.callback_query(F.data == "admin_add")
-async def admin_add_start(call: CallbackQuery, state: FSMContext) -> None:
-    if call.from_user.id != config.ADMIN_ID:
-        await call.answer("❌ Faqat asosiy admin.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_add_admin)
-    await call.message.answer("➕ Admin qilinadigan foydalanuvchi ID yuboring:")
-
-
-@router.callback_query(F.data == "admin_del")
-async def admin_del_start(call: CallbackQuery, state: FSMContext) -> None:
-    if call.from_user.id != config.ADMIN_ID:
-        await call.answer("❌ Faqat asosiy admin.", show_alert=True)
-        return
-    await state.set_state(AdminStates.wait_del_admin)
-    await call.message.answer("➖ Adminlikdan olinadigan foydalanuvchi ID yuboring:")
-
-
-@router.message(AdminStates.wait_add_admin)
-async def admin_add_finish(msg: Message, state: FSMContext) -> None:
-    if msg.from_user.id != config.ADMIN_ID:
-        return
-    if not msg.text.isdigit():
-        await msg.answer("❌ Foydalanuvchi ID raqam bo'lishi kerak.")
-        return
-    add_admin(int(msg.text))
-    await state.clear()
-    await msg.answer("✅ Admin qo'shildi.", reply_markup=admin_kb)
-
-
-@router.message(AdminStates.wait_del_admin)
-async def admin_del_finish(msg: Message, state: FSMContext) -> None:
-    if msg.from_user.id != config.ADMIN_ID:
-        return
-    if not msg.text.isdigit():
-        await msg.answer("❌ Foydalanuvchi ID raqam bo'lishi kerak.")
-        return
-    remove_admin(int(msg.text))
-    await state.clear()
-    await msg.answer("🗑 Admin o'chirildi.", reply_markup=admin_kb)
-
-
-@router.callback_query(F.data == "admin_back")
-async def admin_back(call: CallbackQuery, state: FSMContext) -> None:
-    if not has_admin_access(call.from_user.id):
-        return
-    await state.clear()
-    await call.message.edit_text(
-        "🛠 <b>ADMIN PANEL</b>\n\nBoshqaruv bo‘limini tanlang 👇",
-        reply_markup=admin_kb,
-        parse_mode="HTML",
-    )
-
-
-@router.message(AdminStates.wait_confirm_deposit)
-async def confirm_deposit_cmd(msg: Message, state: FSMContext, bot: Bot) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    if not msg.text.isdigit():
-        await msg.answer("❌ Foydalanuvchi ID raqam bo'lishi kerak.")
-        return
-    user_id = int(msg.text)
-    user = confirm_deposit(user_id)
-    if not user:
-        await msg.answer("❌ Depozit topilmadi.")
-        return
-
-    if user["first_deposit_done"] == 0 and user["pending_status"]:
-        status = user["pending_status"]
-        ref_bonus = config.TARIFFS[status]["ref_bonus"]
-        db = get_db()
-        if user["referred_by"]:
-            db.execute(
-                "UPDATE users SET balance = balance + ?, refs = refs + 1 WHERE user_id = ?",
-                (ref_bonus, user["referred_by"]),
-            )
-        if config.FIRST_DEPOSIT_BONUS > 0:
-            db.execute(
-                "UPDATE users SET balance = balance + ? WHERE user_id = ?",
-                (config.FIRST_DEPOSIT_BONUS, user_id),
-            )
-        db.commit()
-        mark_first_deposit(user_id, status)
-
-    await state.clear()
-    await msg.answer("✅ Depozit tasdiqlandi.", reply_markup=admin_kb)
-    await bot.send_message(user_id, "✅ Depozitingiz tasdiqlandi, balansingiz yangilandi.")
-
-
-@router.message(AdminStates.wait_confirm_withdraw)
-async def confirm_withdraw_cmd(msg: Message, state: FSMContext, bot: Bot) -> None:
-    if not has_admin_access(msg.from_user.id):
-        return
-    if not msg.text.isdigit():
-        await msg.answer("❌ So'rov ID raqam bo'lishi kerak.")
-        return
-    req_id = int(msg.text)
-    db = get_db()
-    row = db.execute(
-        "SELECT id, user_id, amount FROM withdrawals WHERE id = ? AND status = 'pending'",
-        (req_id,),
-    ).fetchone()
-    if not row:
-        await msg.answer("❌ So'rov topilmadi.")
-        return
-    db.execute(
-        "UPDATE users SET balance = balance - ? WHERE user_id = ?",
-        (row["amount"], row["user_id"]),
-    )
-    db.execute("UPDATE withdrawals SET status = 'done' WHERE id = ?", (req_id,))
-    db.commit()
-    await state.clear()
-    await msg.answer("✅ Pul yechish tasdiqlandi.", reply_markup=admin_kb)
-    await bot.send_message(row["user_id"], "✅ Pul yechish so'rovingiz tasdiqlandi.")
+import asyncio
+import html
+import os
+import tempfile
+import time
+
+from aiogram import Bot, F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import (
+    CallbackQuery,
+    FSInputFile,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
+
+import config
+from alerts import deposit_caption, deposit_kb
+from broadcast import notify_users, start_broadcast
+from cache import invalidate_channel, users as user_cache
+from database import (
+    add_admin,
+    add_bonus_channel,
+    add_mandatory_channel,
+    add_promo,
+    confirm_deposit,
+    confirm_deposits,
+    confirm_withdrawals,
+    EXPORT_QUERIES,
+    FIRST_PAGE,
+    Cursor,
+    Page,
+    export_table,
+    get_admins_page,
+    get_deposit,
+    get_oldest_pending_deposit_id,
+    get_bonus_channels,
+    get_mandatory_channels_page,
+    get_pending_deposit_ids_between,
+    get_pending_deposits_page,
+    get_pending_withdrawal_ids_between,
+    get_pending_withdrawals_page,
+    get_promos_page,
+    get_stats,
+    is_admin,
+    remove_admin,
+    remove_bonus_channel,
+    remove_mandatory_channel,
+    remove_promo,
+)
+from metrics import metrics
+
+router = Router()
+
+# Card text is free-form user input; cap it so a page always fits in one message.
+CARD_TEXT_LIMIT = 100
+# Upper bound on IDs approved in one go, so a typo like "1-9999999" stays cheap.
+BULK_LIMIT = 1000
+
+DEPOSIT_DONE_TEXT = "✅ Depozitingiz tasdiqlandi, balansingiz yangilandi."
+WITHDRAW_DONE_TEXT = "✅ Pul yechish so'rovingiz tasdiqlandi."
+
+EXPORT_FORMATS = ("csv", "jsonl")
+# Bots cannot upload documents larger than 50 MB.
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+EXPORT_UPLOAD_TIMEOUT = 300
+
+# Receipt buttons per row in the deposit list.
+RECEIPT_BUTTONS_PER_ROW = 5
+
+# One export at a time, so they never occupy more than one database thread.
+_export_lock = asyncio.Lock()
+
+
+class AdminStates(StatesGroup):
+    wait_broadcast = State()
+    wait_mand_add = State()
+    wait_mand_del = State()
+    wait_bonus_add = State()
+    wait_bonus_del = State()
+    wait_promo_add = State()
+    wait_promo_del = State()
+    wait_confirm_deposit = State()
+    wait_confirm_withdraw = State()
+    wait_add_admin = State()
+    wait_del_admin = State()
+
+
+def has_admin_access(user_id: int) -> bool:
+    return user_id == config.ADMIN_ID or is_admin(user_id)
+
+
+admin_kb = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="📊 Statistika", callback_data="admin_stats")],
+        [InlineKeyboardButton(text="📢 Majburiy kanallar", callback_data="admin_mandatory")],
+        [InlineKeyboardButton(text="🎁 Bonus kanallar", callback_data="admin_bonus")],
+        [InlineKeyboardButton(text="💳 Depozitlar", callback_data="admin_deposits")],
+        [InlineKeyboardButton(text="💸 Pul yechish", callback_data="admin_withdraws")],
+        [InlineKeyboardButton(text="🏷 Promokodlar", callback_data="admin_promos")],
+        [InlineKeyboardButton(text="👤 Adminlar", callback_data="admin_staff")],
+        [InlineKeyboardButton(text="📣 Reklama yuborish", callback_data="admin_broadcast")],
+        [InlineKeyboardButton(text="📤 Eksport", callback_data="admin_export")],
+    ]
+)
+
+export_kb = InlineKeyboardMarkup(
+    inline_keyboard=[
+        *(
+            [
+                InlineKeyboardButton(text=f"{table} · {fmt}", callback_data=f"export:{table}:{fmt}")
+                for fmt in EXPORT_FORMATS
+            ]
+            for table in EXPORT_QUERIES
+        ),
+        [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
+    ]
+)
+
+
+def parse_cursor(data: str) -> Cursor:
+    if not data.startswith("pg:"):
+        return FIRST_PAGE
+    _, _, direction, key = data.split(":")
+    return direction, int(key)
+
+
+def page_nav(view: str, page: Page) -> list[list[InlineKeyboardButton]]:
+    buttons = []
+    if page.has_prev:
+        buttons.append(
+            InlineKeyboardButton(text="◀️", callback_data=f"pg:{view}:<:{page.first_key}")
+        )
+    if page.has_next:
+        buttons.append(
+            InlineKeyboardButton(text="▶️", callback_data=f"pg:{view}:>:{page.last_key}")
+        )
+    return [buttons] if buttons else []
+
+
+def parse_ids(text: str) -> list[int] | None:
+    ids: list[int] = []
+    for part in text.replace(",", " ").split():
+        start, _, end = part.partition("-")
+        if not start.isdigit() or (end and not end.isdigit()):
+            return None
+        first, last = int(start), int(end or start)
+        if first > last or len(ids) + last - first >= BULK_LIMIT:
+            return None
+        ids.extend(range(first, last + 1))
+    return list(dict.fromkeys(ids)) or None
+
+
+async def approve_deposits(bot: Bot, deposit_ids: list[int]) -> str:
+    rows = await confirm_deposits(deposit_ids)
+    notified = await notify_users(bot, [r["user_id"] for r in rows], DEPOSIT_DONE_TEXT)
+    return (
+        f"✅ Tasdiqlangan depozitlar: {len(rows)}/{len(deposit_ids)}\n"
+        f"💰 Jami: {sum(r['amount'] for r in rows):,} so'm\n"
+        f"📨 Xabar yuborildi: {notified}"
+    )
+
+
+async def approve_withdrawals(bot: Bot, req_ids: list[int]) -> str:
+    rows = await confirm_withdrawals(req_ids)
+    notified = await notify_users(bot, [r["user_id"] for r in rows], WITHDRAW_DONE_TEXT)
+    return (
+        f"✅ Tasdiqlangan so'rovlar: {len(rows)}/{len(req_ids)}\n"
+        f"💰 Jami: {sum(r['amount'] for r in rows):,} so'm\n"
+        f"📨 Xabar yuborildi: {notified}"
+    )
+
+
+async def send_export(bot: Bot, chat_id: int, table: str, fmt: str) -> None:
+    if _export_lock.locked():
+        await bot.send_message(chat_id, "⏳ Boshqa eksport bajarilmoqda, biroz kuting.")
+        return
+    async with _export_lock:
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}.gz")
+        os.close(fd)
+        try:
+            count = await export_table(table, fmt, path)
+            size = os.path.getsize(path)
+            if size > EXPORT_MAX_BYTES:
+                await bot.send_message(
+                    chat_id,
+                    f"❌ Fayl juda katta ({size / 1024 / 1024:.1f} MB). "
+                    "Telegram 50 MB dan katta fayllarni qabul qilmaydi.",
+                )
+                return
+            filename = f"{table}-{time.strftime('%Y%m%d-%H%M')}.{fmt}.gz"
+            await bot.send_document(
+                chat_id,
+                FSInputFile(path, filename=filename),
+                caption=f"📤 {table}: {count:,} qator",
+                request_timeout=EXPORT_UPLOAD_TIMEOUT,
+            )
+        finally:
+            os.remove(path)
+
+
+@router.message(Command("admin"))
+async def admin_panel(msg: Message) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    await msg.answer(
+        "🛠 <b>ADMIN PANEL</b>\n\nBoshqaruv bo‘limini tanlang 👇",
+        reply_markup=admin_kb,
+        parse_mode="HTML",
+    )
+
+
+@router.message(F.text == "🛠 Admin panel")
+async def admin_panel_button(msg: Message) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    await admin_panel(msg)
+
+
+@router.callback_query(F.data == "admin_stats")
+async def admin_stats(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    stats = await get_stats()
+    text = (
+        "📊 <b>STATISTIKA</b>\n\n"
+        f"👥 Foydalanuvchilar: {stats['users']}\n"
+        f"💰 Jami balanslar: {stats['balance']:,} so'm\n"
+        f"⏳ Kutilayotgan depozitlar: {stats['pending_deposit']:,} so'm\n\n"
+        "📅 <b>Bugun:</b>\n"
+        f"➕ Yangi foydalanuvchilar: {stats['signups']}\n"
+        f"💳 Depozitlar: {stats['deposits']} ta, {stats['deposits_amount']:,} so'm\n"
+        f"💸 Yechishlar: {stats['withdrawals']} ta, {stats['withdrawals_amount']:,} so'm\n\n"
+        f"🧠 Kesh: {len(user_cache)} foydalanuvchi, "
+        f"{user_cache.hits} hit / {user_cache.misses} miss\n"
+        f"{metrics.summary()}"
+    )
+    await call.message.edit_text(text, reply_markup=admin_kb, parse_mode="HTML")
+
+
+@router.callback_query((F.data == "admin_mandatory") | F.data.startswith("pg:mandatory:"))
+async def mandatory_list(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    page = await get_mandatory_channels_page(parse_cursor(call.data))
+    text = "📢 <b>Majburiy kanallar:</b>\n\n"
+    for r in page.rows:
+        text += f"• <code>{r['channel_id']}</code>\n"
+
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            *page_nav("mandatory", page),
+            [InlineKeyboardButton(text="➕ Kanal qo'shish", callback_data="mand_add")],
+            [InlineKeyboardButton(text="➖ Kanal o'chirish", callback_data="mand_del")],
+            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
+        ]
+    )
+    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@router.callback_query(F.data == "mand_add")
+async def add_mand_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_mand_add)
+    await call.message.answer("➕ Kanal username yuboring (masalan: @kanal):")
+
+
+@router.callback_query(F.data == "mand_del")
+async def del_mand_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_mand_del)
+    await call.message.answer("➖ O'chiriladigan kanal username yuboring (masalan: @kanal):")
+
+
+@router.message(AdminStates.wait_mand_add)
+async def add_mand(msg: Message, state: FSMContext) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    ch_id = msg.text.strip()
+    await add_mandatory_channel(ch_id)
+    invalidate_channel(ch_id)
+    await state.clear()
+    await msg.answer(f"✅ {ch_id} qo'shildi.", reply_markup=admin_kb)
+
+
+@router.message(AdminStates.wait_mand_del)
+async def del_mand(msg: Message, state: FSMContext) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    ch_id = msg.text.strip()
+    await remove_mandatory_channel(ch_id)
+    invalidate_channel(ch_id)
+    await state.clear()
+    await msg.answer(f"🗑 {ch_id} o'chirildi.", reply_markup=admin_kb)
+
+
+@router.callback_query(F.data == "admin_bonus")
+async def bonus_list(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    rows = get_bonus_channels()
+    text = "🎁 <b>Bonus kanallar:</b>\n\n"
+    for r in rows:
+        text += f"• {r['channel_id']} ({r['bonus']} so'm)\n"
+
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="➕ Bonus kanal qo'shish", callback_data="bonus_add")],
+            [InlineKeyboardButton(text="➖ Bonus kanal o'chirish", callback_data="bonus_del")],
+            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
+        ]
+    )
+    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@router.callback_query(F.data == "bonus_add")
+async def add_bonus_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_bonus_add)
+    await call.message.answer("➕ Format: @kanal 500")
+
+
+@router.callback_query(F.data == "bonus_del")
+async def del_bonus_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_bonus_del)
+    await call.message.answer("➖ O'chiriladigan kanal username yuboring (masalan: @kanal):")
+
+
+@router.message(AdminStates.wait_bonus_add)
+async def add_bonus_cmd(msg: Message, state: FSMContext) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    args = msg.text.split()
+    if len(args) < 2:
+        await msg.answer("❌ Format: @kanal 500")
+        return
+    await add_bonus_channel(args[0], int(args[1]))
+    await state.clear()
+    await msg.answer(f"✅ {args[0]} ({args[1]} so'm) qo'shildi.", reply_markup=admin_kb)
+
+
+@router.message(AdminStates.wait_bonus_del)
+async def del_bonus_cmd(msg: Message, state: FSMContext) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    ch_id = msg.text.strip()
+    await remove_bonus_channel(ch_id)
+    await state.clear()
+    await msg.answer(f"🗑 {ch_id} o'chirildi.", reply_markup=admin_kb)
+
+
+@router.callback_query((F.data == "admin_promos") | F.data.startswith("pg:promos:"))
+async def promo_list(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    page = await get_promos_page(parse_cursor(call.data))
+    text = "🏷 <b>Promokodlar:</b>\n\n"
+    for r in page.rows:
+        text += f"• <code>{r['code']}</code> | {r['amount']} so'm | {r['limit_count']} ta\n"
+
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            *page_nav("promos", page),
+            [InlineKeyboardButton(text="➕ Promokod qo'shish", callback_data="promo_add")],
+            [InlineKeyboardButton(text="➖ Promokod o'chirish", callback_data="promo_del")],
+            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
+        ]
+    )
+    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@router.callback_query(F.data == "promo_add")
+async def add_promo_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_promo_add)
+    await call.message.answer("➕ Format: CODE SUMMA LIMIT")
+
+
+@router.callback_query(F.data == "promo_del")
+async def del_promo_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_promo_del)
+    await call.message.answer("➖ O'chiriladigan promokod nomini yuboring:")
+
+
+@router.message(AdminStates.wait_promo_add)
+async def add_promo_cmd(msg: Message, state: FSMContext) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    args = msg.text.split()
+    if len(args) < 3:
+        await msg.answer("❌ Format: CODE SUMMA LIMIT")
+        return
+    await add_promo(args[0], int(args[1]), int(args[2]))
+    await state.clear()
+    await msg.answer(f"✅ Promokod {args[0]} yaratildi.", reply_markup=admin_kb)
+
+
+@router.message(AdminStates.wait_promo_del)
+async def del_promo_cmd(msg: Message, state: FSMContext) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    code = msg.text.strip()
+    await remove_promo(code)
+    await state.clear()
+    await msg.answer(f"🗑 Promokod {code} o'chirildi.", reply_markup=admin_kb)
+
+
+@router.callback_query((F.data == "admin_deposits") | F.data.startswith("pg:deposits:"))
+async def dep_list(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    page = await get_pending_deposits_page(parse_cursor(call.data))
+    text = "💳 <b>Depozitlar:</b>\n"
+
+    if not page.rows:
+        await call.message.edit_text("Bo'sh", reply_markup=admin_kb, parse_mode="HTML")
+        return
+
+    for r in page.rows:
+        text += (
+            f"\n#{r['id']} | 🆔 <code>{r['user_id']}</code> | {r['amount']} so'm"
+            f"\nTarif: {r['tariff']}\n"
+        )
+
+    receipts = [
+        InlineKeyboardButton(text=f"🧾 #{r['id']}", callback_data=f"dep_photo_{r['id']}")
+        for r in page.rows
+    ]
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            *(
+                receipts[i : i + RECEIPT_BUTTONS_PER_ROW]
+                for i in range(0, len(receipts), RECEIPT_BUTTONS_PER_ROW)
+            ),
+            *page_nav("deposits", page),
+            [InlineKeyboardButton(text="✅ Tasdiqlash", callback_data="deposit_confirm_start")],
+            [
+                InlineKeyboardButton(
+                    text="✅ Sahifani tasdiqlash",
+                    callback_data=f"bulk:deposits:{page.first_key}:{page.last_key}",
+                )
+            ],
+            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
+        ]
+    )
+    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@router.callback_query(F.data.startswith("dep_photo_"))
+async def deposit_receipt(call: CallbackQuery, bot: Bot) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    deposit = await get_deposit(int(call.data.split("_")[2]))
+    if not deposit or not deposit["photo_file_id"]:
+        await call.answer("❌ Chek topilmadi.", show_alert=True)
+        return
+    await call.answer()
+    await bot.send_photo(
+        call.from_user.id,
+        photo=deposit["photo_file_id"],
+        caption=deposit_caption(
+            deposit["id"], deposit["user_id"], deposit["tariff"], deposit["amount"]
+        ),
+        reply_markup=deposit_kb(deposit["id"]) if deposit["status"] == "pending" else None,
+        parse_mode="HTML",
+    )
+
+
+@router.callback_query(F.data == "deposit_confirm_start")
+async def confirm_deposit_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_confirm_deposit)
+    await call.message.answer(
+        "✅ Tasdiqlash uchun depozit ID yuboring.\n"
+        "Bir nechtasini ham yuborish mumkin: <code>12, 15, 20-40</code>",
+        parse_mode="HTML",
+    )
+
+
+@router.callback_query(F.data.startswith("dep_ok_") | F.data.startswith("adm_ok_"))
+async def confirm_deposit_callback(call: CallbackQuery, bot: Bot) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    if call.data.startswith("dep_ok_"):
+        deposit_id = int(call.data.split("_")[2])
+    else:
+        # Receipts sent before the deposits table carry the user ID instead.
+        deposit_id = await get_oldest_pending_deposit_id(int(call.data.split("_")[2]))
+    deposit = await confirm_deposit(deposit_id) if deposit_id else None
+    if not deposit:
+        await call.answer("❌ Depozit topilmadi.", show_alert=True)
+        return
+
+    await call.message.edit_caption("✅ Depozit tasdiqlandi.")
+    await bot.send_message(deposit["user_id"], DEPOSIT_DONE_TEXT)
+
+
+@router.callback_query((F.data == "admin_withdraws") | F.data.startswith("pg:withdraws:"))
+async def with_list(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    page = await get_pending_withdrawals_page(parse_cursor(call.data))
+    text = "💸 <b>Yechish so'rovlari:</b>\n"
+
+    if not page.rows:
+        await call.message.edit_text("Bo'sh", reply_markup=admin_kb, parse_mode="HTML")
+        return
+
+    for r in page.rows:
+        text += (
+            f"\n#{r['id']} | 🆔 <code>{r['user_id']}</code> | {r['amount']} so'm"
+            f"\nKarta: {html.escape(r['card_text'][:CARD_TEXT_LIMIT])}\n"
+        )
+
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            *page_nav("withdraws", page),
+            [InlineKeyboardButton(text="✅ Tasdiqlash", callback_data="withdraw_confirm_start")],
+            [
+                InlineKeyboardButton(
+                    text="✅ Sahifani tasdiqlash",
+                    callback_data=f"bulk:withdraws:{page.first_key}:{page.last_key}",
+                )
+            ],
+            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
+        ]
+    )
+    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@router.callback_query(F.data == "withdraw_confirm_start")
+async def confirm_withdraw_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_confirm_withdraw)
+    await call.message.answer(
+        "✅ Tasdiqlash uchun so'rov ID yuboring.\n"
+        "Bir nechtasini ham yuborish mumkin: <code>12, 15, 20-40</code>",
+        parse_mode="HTML",
+    )
+
+
+# "Approve this page": pending IDs are listed in ascending order, so every
+# pending row between the first and last key shown is exactly the page.
+@router.callback_query(F.data.startswith("bulk:"))
+async def approve_page(call: CallbackQuery, bot: Bot) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    _, view, first, last = call.data.split(":")
+    first, last = int(first), int(last)
+    if view == "deposits":
+        ids = await get_pending_deposit_ids_between(first, last)
+    else:
+        ids = await get_pending_withdrawal_ids_between(first, last)
+    if not ids:
+        await call.answer("❌ Tasdiqlanadigan so'rov yo'q.", show_alert=True)
+        return
+    await call.answer("⏳ Tasdiqlanmoqda...")
+    if view == "deposits":
+        text = await approve_deposits(bot, ids)
+    else:
+        text = await approve_withdrawals(bot, ids)
+    await call.message.edit_text(text, reply_markup=admin_kb)
+
+
+@router.callback_query(F.data == "admin_broadcast")
+async def broadcast_start(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_broadcast)
+    await call.message.answer("📣 Reklama xabarini yuboring (Rasm, Video yoki Matn):")
+
+
+@router.message(AdminStates.wait_broadcast)
+async def broadcast_finish(msg: Message, state: FSMContext, bot: Bot) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    await state.clear()
+    status = await msg.answer("📣 Reklama yuborish boshlandi...", reply_markup=admin_kb)
+    start_broadcast(bot, msg.chat.id, msg.message_id, status.message_id)
+
+
+@router.callback_query((F.data == "admin_staff") | F.data.startswith("pg:staff:"))
+async def admin_staff(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    page = await get_admins_page(parse_cursor(call.data))
+    text = "👤 <b>Adminlar ro'yxati:</b>\n\n"
+    for r in page.rows:
+        text += f"• <code>{r['user_id']}</code>\n"
+    if not page.rows:
+        text += "Hozircha qo'shimcha admin yo'q.\n"
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            *page_nav("staff", page),
+            [InlineKeyboardButton(text="➕ Admin qo'shish", callback_data="admin_add")],
+            [InlineKeyboardButton(text="➖ Admin o'chirish", callback_data="admin_del")],
+            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data="admin_back")],
+        ]
+    )
+    await call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@router.callback_query(F.data == "admin_add")
+async def admin_add_start(call: CallbackQuery, state: FSMContext) -> None:
+    if call.from_user.id != config.ADMIN_ID:
+        await call.answer("❌ Faqat asosiy admin.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_add_admin)
+    await call.message.answer("➕ Admin qilinadigan foydalanuvchi ID yuboring:")
+
+
+@router.callback_query(F.data == "admin_del")
+async def admin_del_start(call: CallbackQuery, state: FSMContext) -> None:
+    if call.from_user.id != config.ADMIN_ID:
+        await call.answer("❌ Faqat asosiy admin.", show_alert=True)
+        return
+    await state.set_state(AdminStates.wait_del_admin)
+    await call.message.answer("➖ Adminlikdan olinadigan foydalanuvchi ID yuboring:")
+
+
+@router.message(AdminStates.wait_add_admin)
+async def admin_add_finish(msg: Message, state: FSMContext) -> None:
+    if msg.from_user.id != config.ADMIN_ID:
+        return
+    if not msg.text.isdigit():
+        await msg.answer("❌ Foydalanuvchi ID raqam bo'lishi kerak.")
+        return
+    await add_admin(int(msg.text))
+    await state.clear()
+    await msg.answer("✅ Admin qo'shildi.", reply_markup=admin_kb)
+
+
+@router.message(AdminStates.wait_del_admin)
+async def admin_del_finish(msg: Message, state: FSMContext) -> None:
+    if msg.from_user.id != config.ADMIN_ID:
+        return
+    if not msg.text.isdigit():
+        await msg.answer("❌ Foydalanuvchi ID raqam bo'lishi kerak.")
+        return
+    await remove_admin(int(msg.text))
+    await state.clear()
+    await msg.answer("🗑 Admin o'chirildi.", reply_markup=admin_kb)
+
+
+@router.callback_query(F.data == "admin_export")
+async def export_menu(call: CallbackQuery) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    await call.message.edit_text(
+        "📤 <b>Eksport</b>\n\nJadval va formatni tanlang (gzip bilan siqilgan fayl).\n"
+        "Buyruq orqali: <code>/export users csv</code>",
+        reply_markup=export_kb,
+        parse_mode="HTML",
+    )
+
+
+@router.callback_query(F.data.startswith("export:"))
+async def export_callback(call: CallbackQuery, bot: Bot) -> None:
+    if not has_admin_access(call.from_user.id):
+        await call.answer("❌ Ruxsat yo'q.", show_alert=True)
+        return
+    _, table, fmt = call.data.split(":")
+    if table not in EXPORT_QUERIES or fmt not in EXPORT_FORMATS:
+        await call.answer()
+        return
+    await call.answer("⏳ Fayl tayyorlanmoqda...")
+    await send_export(bot, call.from_user.id, table, fmt)
+
+
+@router.message(Command("export"))
+async def export_cmd(msg: Message, command: CommandObject, bot: Bot) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    table, _, fmt = (command.args or "").strip().partition(" ")
+    fmt = fmt.strip() or "csv"
+    if table not in EXPORT_QUERIES or fmt not in EXPORT_FORMATS:
+        await msg.answer(
+            "❌ Foydalanish: /export &lt;jadval&gt; [csv|jsonl]\n"
+            f"Jadvallar: {', '.join(EXPORT_QUERIES)}",
+            parse_mode="HTML",
+        )
+        return
+    await msg.answer("⏳ Fayl tayyorlanmoqda...")
+    await send_export(bot, msg.chat.id, table, fmt)
+
+
+@router.callback_query(F.data == "admin_back")
+async def admin_back(call: CallbackQuery, state: FSMContext) -> None:
+    if not has_admin_access(call.from_user.id):
+        return
+    await state.clear()
+    await call.message.edit_text(
+        "🛠 <b>ADMIN PANEL</b>\n\nBoshqaruv bo‘limini tanlang 👇",
+        reply_markup=admin_kb,
+        parse_mode="HTML",
+    )
+
+
+@router.message(AdminStates.wait_confirm_deposit)
+async def confirm_deposit_cmd(msg: Message, state: FSMContext, bot: Bot) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    deposit_ids = parse_ids(msg.text or "")
+    if not deposit_ids:
+        await msg.answer(
+            f"❌ Depozit ID raqam yoki oraliq bo'lishi kerak (ko'pi bilan {BULK_LIMIT} ta)."
+        )
+        return
+    await state.clear()
+    await msg.answer(await approve_deposits(bot, deposit_ids), reply_markup=admin_kb)
+
+
+@router.message(AdminStates.wait_confirm_withdraw)
+async def confirm_withdraw_cmd(msg: Message, state: FSMContext, bot: Bot) -> None:
+    if not has_admin_access(msg.from_user.id):
+        return
+    req_ids = parse_ids(msg.text or "")
+    if not req_ids:
+        await msg.answer(
+            f"❌ So'rov ID raqam yoki oraliq bo'lishi kerak (ko'pi bilan {BULK_LIMIT} ta)."
+        )
+        return
+    await state.clear()
+    await msg.answer(await approve_withdrawals(bot, req_ids), reply_markup=admin_kb)
@@ -1,34 +1,93 @@
-import asyncio
-import logging
-
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-
-from config import BOT_TOKEN
-from database import init_db
-import handlers_user
-import handlers_admin
-
-
-logging.basicConfig(level=logging.INFO)
-
-
-async def main() -> None:
-    init_db()
-
-    bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
-
-    dp.include_router(handlers_admin.router)
-    dp.include_router(handlers_user.router)
-
-    print("🚀 Bot muvaffaqiyatli ishga tushdi...")
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
-
-
-if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except (KeyboardInterrupt, SystemExit):
-        print("🤖 Bot to'xtatildi!")
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+import config
+from alerts import admin_alerts
+from database import close_db, init_db, watch_registries
+import handlers_user
+import handlers_admin
+import metrics
+import sender
+from storage import SQLiteStorage
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def run_polling(bot: Bot, dp: Dispatcher) -> None:
+    await bot.delete_webhook(drop_pending_updates=True)
+    await dp.start_polling(bot)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    # Every worker behind the load balancer registers the same URL, so
+    # pending updates are kept rather than dropped on restart.
+    await bot.set_webhook(
+        f"{config.WEBHOOK_URL}{config.WEBHOOK_PATH}",
+        allowed_updates=dp.resolve_used_update_types(),
+        secret_token=config.WEBHOOK_SECRET,
+    )
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.WEBHOOK_SECRET,
+    ).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def main() -> None:
+    await init_db()
+
+    bot = Bot(token=config.BOT_TOKEN)
+    dp = Dispatcher(storage=SQLiteStorage())
+
+    dp.include_router(handlers_admin.router)
+    dp.include_router(handlers_user.router)
+    # Installed first so the metrics middleware times each attempt, not the queueing.
+    sender.install(bot)
+    metrics.instrument(bot, handlers_admin.router, handlers_user.router)
+    metrics_runner = None
+    if config.METRICS_PORT:
+        metrics_runner = await metrics.start_server(config.METRICS_HOST, config.METRICS_PORT)
+
+    print("🚀 Bot muvaffaqiyatli ishga tushdi...")
+    # Picks up admin and channel edits made by other workers sharing the database.
+    registry_watcher = asyncio.create_task(watch_registries(config.CHANNELS_REFRESH_INTERVAL))
+    try:
+        # Cached on the Bot instance; handlers read it via bot.me().
+        await bot.me()
+        if config.BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await run_polling(bot, dp)
+    finally:
+        registry_watcher.cancel()
+        # Polling closes the bot session on exit; the flush reopens it.
+        await admin_alerts.close()
+        await bot.session.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await dp.storage.close()
+        await close_db()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, SystemExit):
+        print("🤖 Bot to'xtatildi!")
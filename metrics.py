@@ -0,0 +1,215 @@
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot, Router
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import web
+
+from cache import users as user_cache
+
+# Histogram bucket upper bounds in seconds, as in the Prometheus client defaults.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Upper bound of the bucket holding the q-th observation.
+    def quantile(self, q: float) -> float:
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.handler_latency: defaultdict[str, Histogram] = defaultdict(Histogram)
+        self.handler_errors: Counter[str] = Counter()
+        self.in_flight = 0
+        self.api_latency: defaultdict[str, Histogram] = defaultdict(Histogram)
+        self.api_errors: Counter[tuple[str, str]] = Counter()
+        self.send_queue: Counter[str] = Counter()
+        self.send_wait: defaultdict[str, Histogram] = defaultdict(Histogram)
+        self.send_retries = 0
+
+    def render(self) -> str:
+        lines: list[str] = []
+        _histograms(
+            lines,
+            "bot_handler_duration_seconds",
+            "Time spent in each update handler.",
+            "handler",
+            self.handler_latency,
+        )
+        lines += [
+            "# HELP bot_handler_errors_total Handler calls that raised.",
+            "# TYPE bot_handler_errors_total counter",
+        ]
+        lines += [
+            f'bot_handler_errors_total{{handler="{name}"}} {count}'
+            for name, count in sorted(self.handler_errors.items())
+        ]
+        lines += [
+            "# HELP bot_handlers_in_progress Handler calls currently running.",
+            "# TYPE bot_handlers_in_progress gauge",
+            f"bot_handlers_in_progress {self.in_flight}",
+        ]
+        _histograms(
+            lines,
+            "bot_api_request_duration_seconds",
+            "Time spent in each Bot API method.",
+            "method",
+            self.api_latency,
+        )
+        lines += [
+            "# HELP bot_api_errors_total Bot API calls that failed, by exception type.",
+            "# TYPE bot_api_errors_total counter",
+        ]
+        lines += [
+            f'bot_api_errors_total{{method="{method}",error="{error}"}} {count}'
+            for (method, error), count in sorted(self.api_errors.items())
+        ]
+        lines += [
+            "# HELP bot_send_queue_depth Outgoing messages waiting for a send slot.",
+            "# TYPE bot_send_queue_depth gauge",
+        ]
+        lines += [
+            f'bot_send_queue_depth{{priority="{name}"}} {depth}'
+            for name, depth in sorted(self.send_queue.items())
+        ]
+        _histograms(
+            lines,
+            "bot_send_wait_seconds",
+            "Time outgoing messages waited for a send slot.",
+            "priority",
+            self.send_wait,
+        )
+        lines += [
+            "# HELP bot_send_retries_total Sends retried after a 429 RetryAfter.",
+            "# TYPE bot_send_retries_total counter",
+            f"bot_send_retries_total {self.send_retries}",
+        ]
+        lines += [
+            "# HELP bot_user_cache_requests_total User cache lookups by result.",
+            "# TYPE bot_user_cache_requests_total counter",
+            f'bot_user_cache_requests_total{{result="hit"}} {user_cache.hits}',
+            f'bot_user_cache_requests_total{{result="miss"}} {user_cache.misses}',
+        ]
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top: int = 3) -> str:
+        handled = sum(h.count for h in self.handler_latency.values())
+        api_calls = sum(h.count for h in self.api_latency.values())
+        text = (
+            f"⚙️ Handlerlar: {handled} ta, xatolar: {sum(self.handler_errors.values())}, "
+            f"hozir: {self.in_flight}\n"
+            f"📡 Bot API: {api_calls} so'rov, xatolar: {sum(self.api_errors.values())}\n"
+            f"📤 Navbatda: {sum(self.send_queue.values())}, qayta urinishlar: {self.send_retries}"
+        )
+        slowest = sorted(
+            self.handler_latency.items(), key=lambda item: item[1].quantile(0.95), reverse=True
+        )[:top]
+        for name, histogram in slowest:
+            text += f"\n• {name}: p95 {_format_bound(histogram.quantile(0.95))}"
+        return text
+
+
+def _histograms(
+    lines: list[str], name: str, help_text: str, label: str, series: dict[str, Histogram]
+) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for value, histogram in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label}="{value}"}} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+
+
+def _format_bound(seconds: float) -> str:
+    if seconds == float("inf"):
+        return f"> {BUCKETS[-1]:g} s"
+    return f"≤ {seconds * 1000:g} ms"
+
+
+metrics = Metrics()
+
+
+# Registered as an inner middleware: the handler is only known once the
+# router's filters have matched.
+class HandlerMetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.handler_errors[name] += 1
+            raise
+        finally:
+            metrics.handler_latency[name].observe(time.perf_counter() - started)
+            metrics.in_flight -= 1
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            metrics.api_errors[name, type(e).__name__] += 1
+            raise
+        finally:
+            metrics.api_latency[name].observe(time.perf_counter() - started)
+
+
+def instrument(bot: Bot, *routers: Router) -> None:
+    bot.session.middleware(RequestMetricsMiddleware())
+    for router in routers:
+        router.message.middleware(HandlerMetricsMiddleware())
+        router.callback_query.middleware(HandlerMetricsMiddleware())
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
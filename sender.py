@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+import config
+from metrics import metrics
+
+# Lower value = served first. Handlers answer users at INTERACTIVE priority;
+# broadcasts and bulk notifications run inside priority(BULK).
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+send_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+# Methods that count against Telegram's message limits (about 30 per second
+# overall and about one per second in a single chat).
+RATE_LIMITED = {
+    "sendMessage",
+    "sendPhoto",
+    "sendDocument",
+    "sendMediaGroup",
+    "copyMessage",
+    "forwardMessage",
+    "editMessageText",
+    "editMessageCaption",
+    "editMessageReplyMarkup",
+}
+
+# Per-chat buckets are dropped once they have refilled and there are more
+# than this many of them.
+MAX_TRACKED_CHATS = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Takes a token only if one is free right now and nobody is waiting.
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        if self._lock.locked() or now < self.paused_until:
+            return False
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    token = send_priority.set(level)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+# Registered on bot.session, so every outgoing message goes through it no
+# matter where it is sent from. A request first waits for its chat's bucket,
+# then joins a priority queue that a single task drains at SEND_RATE. On 429
+# the whole queue is paused for the retry_after Telegram asked for and the
+# request is retried up to SEND_MAX_RETRIES times.
+class SendScheduler(BaseRequestMiddleware):
+    def __init__(self) -> None:
+        # No burst allowance: sends are spaced evenly so no one-second window
+        # ever sees more than SEND_RATE of them.
+        self.bucket = TokenBucket(config.SEND_RATE, 1)
+        self._waiting: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._chats: dict[int | str, tuple[float, float]] = {}
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if method.__api_method__ not in RATE_LIMITED:
+            return await make_request(bot, method)
+        chat_id = getattr(method, "chat_id", None)
+        level = send_priority.get()
+        retries = 0
+        while True:
+            await self._wait_for_chat(chat_id)
+            await self._wait_for_turn(level)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if retries >= config.SEND_MAX_RETRIES:
+                    raise
+                retries += 1
+                metrics.send_retries += 1
+                self.bucket.pause(e.retry_after)
+
+    # Reserves the chat's next slot up front (tokens may go negative), so
+    # concurrent sends to one chat line up without a lock.
+    async def _wait_for_chat(self, chat_id: int | str | None) -> None:
+        if chat_id is None:
+            return
+        now = time.monotonic()
+        rate, burst = config.SEND_CHAT_RATE, config.SEND_CHAT_BURST
+        tokens, updated = self._chats.get(chat_id, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate) - 1
+        self._chats[chat_id] = (tokens, now)
+        if len(self._chats) > MAX_TRACKED_CHATS:
+            self._prune_chats(now)
+        if tokens < 0:
+            await asyncio.sleep(-tokens / rate)
+
+    def _prune_chats(self, now: float) -> None:
+        rate, burst = config.SEND_CHAT_RATE, config.SEND_CHAT_BURST
+        self._chats = {
+            chat_id: (tokens, updated)
+            for chat_id, (tokens, updated) in self._chats.items()
+            if tokens + (now - updated) * rate < burst
+        }
+
+    async def _wait_for_turn(self, level: int) -> None:
+        name = PRIORITY_NAMES[level]
+        if not self._waiting and self.bucket.try_acquire():
+            metrics.send_wait[name].observe(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (level, next(self._order), future))
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        metrics.send_queue[name] += 1
+        started = time.perf_counter()
+        try:
+            await future
+        finally:
+            metrics.send_queue[name] -= 1
+            metrics.send_wait[name].observe(time.perf_counter() - started)
+
+    async def _dispatch(self) -> None:
+        try:
+            while self._waiting:
+                await self.bucket.acquire()
+                # Skip waiters whose request was cancelled meanwhile.
+                while self._waiting:
+                    _, _, future = heapq.heappop(self._waiting)
+                    if not future.done():
+                        future.set_result(None)
+                        break
+        finally:
+            self._dispatcher = None
+
+
+def install(bot: Bot) -> SendScheduler:
+    scheduler = SendScheduler()
+    bot.session.middleware(scheduler)
+    return scheduler
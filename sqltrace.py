@@ -0,0 +1,162 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(sql: str) -> str:
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _LITERALS.sub("?", sql)
+    return _PLACEHOLDER_LISTS.sub("(...)", sql)
+
+
+@dataclass
+class QueryStats:
+    sql: str
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+
+
+# Per-normalized-statement totals, shared by every traced connection.
+_stats: dict[str, QueryStats] = {}
+_lock = threading.Lock()
+
+
+def _record(key: str, sql: str, seconds: float, rows: int, call: bool) -> QueryStats:
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = QueryStats(sql)
+        stats.calls += call
+        stats.seconds += seconds
+        stats.rows += rows
+        return stats
+
+
+# Time is counted both in execute() and while rows are fetched, since SQLite
+# does most of a SELECT's work lazily as the cursor is stepped.
+class TracingCursor(sqlite3.Cursor):
+    _key = ""
+    _sql = ""
+    _elapsed = 0.0
+    _logged = False
+
+    def _start(self, sql: str) -> None:
+        self._key = normalize(sql)
+        self._sql = sql
+        self._elapsed = 0.0
+        self._logged = False
+
+    def _add(self, seconds: float, rows: int, call: bool = False) -> None:
+        if not self._key:
+            return
+        self._elapsed += seconds
+        stats = _record(self._key, self._sql, seconds, rows, call)
+        with _lock:
+            stats.max_seconds = max(stats.max_seconds, self._elapsed)
+        if not self._logged and self._elapsed * 1000 >= config.SQL_SLOW_MS:
+            self._logged = True
+            logger.warning("Slow query (%.1f ms so far): %s", self._elapsed * 1000, self._key)
+
+    def execute(self, sql: str, parameters: Any = (), /) -> "TracingCursor":
+        self._start(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(time.perf_counter() - started, max(self.rowcount, 0), call=True)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any], /) -> "TracingCursor":
+        self._start(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(time.perf_counter() - started, max(self.rowcount, 0), call=True)
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - started, row is not None)
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list[Any]:
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - started, len(rows))
+        return rows
+
+    def __next__(self) -> Any:
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(time.perf_counter() - started, 0)
+            raise
+        self._add(time.perf_counter() - started, 1)
+        return row
+
+
+class TracingConnection(sqlite3.Connection):
+    def cursor(self, factory: type = TracingCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any], /) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def top(limit: int = 10) -> list[QueryStats]:
+    with _lock:
+        return sorted(_stats.values(), key=lambda s: s.seconds, reverse=True)[:limit]
+
+
+def report(conn: sqlite3.Connection, limit: int = 10, explain: int = 3) -> str:
+    lines = ["calls    total ms    avg ms    max ms      rows  query"]
+    offenders = top(limit)
+    for stats in offenders:
+        lines.append(
+            f"{stats.calls:>5} {stats.seconds * 1000:>11.1f} "
+            f"{stats.seconds * 1000 / max(stats.calls, 1):>9.2f} "
+            f"{stats.max_seconds * 1000:>9.2f} {stats.rows:>9}  {normalize(stats.sql)}"
+        )
+    for stats in offenders[:explain]:
+        if not stats.sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+            continue
+        lines.append(f"\nEXPLAIN QUERY PLAN {normalize(stats.sql)}")
+        try:
+            # The plan does not depend on the bound values, so NULLs will do.
+            plan = conn.execute(
+                f"EXPLAIN QUERY PLAN {stats.sql}", [None] * stats.sql.count("?")
+            ).fetchall()
+        except sqlite3.Error as e:
+            lines.append(f"  (unavailable: {e})")
+            continue
+        lines += [f"  {row[3]}" for row in plan]
+    return "\n".join(lines)
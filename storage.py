@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+import config
+from cache import TTLCache
+from database import delete_expired_fsm_records, get_fsm_record, save_fsm_record
+
+PURGE_INTERVAL = 3600
+
+
+@dataclass
+class _Record:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+# FSM storage kept in the bot database with a write-through local cache.
+# States untouched for state_ttl seconds count as abandoned and are purged;
+# cache_ttl bounds how long a cached record is trusted (0 disables caching) and
+# cache_size how many are kept; expired records are swept every cache_ttl.
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        state_ttl: int = config.FSM_STATE_TTL,
+        cache_ttl: int = config.FSM_CACHE_TTL,
+        cache_size: int = config.FSM_CACHE_SIZE,
+    ) -> None:
+        self.state_ttl = state_ttl
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(ttl=cache_ttl, maxsize=cache_size)
+        self._purge_task: asyncio.Task | None = None
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(
+            str(part if part is not None else "")
+            for part in (
+                key.bot_id,
+                key.chat_id,
+                key.user_id,
+                key.thread_id,
+                key.business_connection_id,
+                key.destiny,
+            )
+        )
+
+    async def _load(self, key: str) -> _Record:
+        if self._purge_task is None:
+            self._purge_task = asyncio.create_task(self._purge_expired())
+        record = self._cache.get(key)
+        if record is not None:
+            return record
+        row = await get_fsm_record(key, int(time.time()) - self.state_ttl)
+        record = _Record(row["state"], json.loads(row["data"])) if row else _Record()
+        self._store(key, record)
+        return record
+
+    # Empty records are cached too: aiogram reads the state of every update,
+    # and most updates come from users who are not in any state.
+    def _store(self, key: str, record: _Record) -> None:
+        if not self.cache_ttl:
+            return
+        self._cache.set(key, record)
+
+    async def _save(self, key: str, record: _Record) -> None:
+        await save_fsm_record(key, record.state, json.dumps(record.data))
+        self._store(key, record)
+
+    async def _purge_expired(self) -> None:
+        next_purge = time.monotonic()
+        while True:
+            if time.monotonic() >= next_purge:
+                await delete_expired_fsm_records(int(time.time()) - self.state_ttl)
+                next_purge = time.monotonic() + PURGE_INTERVAL
+            self._cache.expire()
+            await asyncio.sleep(min(self.cache_ttl or PURGE_INTERVAL, PURGE_INTERVAL))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self._key(key)
+        record = await self._load(k)
+        state = state.state if isinstance(state, State) else state
+        await self._save(k, _Record(state, record.data))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(self._key(key))).state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        k = self._key(key)
+        record = await self._load(k)
+        await self._save(k, _Record(record.state, dict(data)))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._load(self._key(key))).data)
+
+    async def close(self) -> None:
+        if self._purge_task is not None:
+            self._purge_task.cancel()
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bot.db")
+
+import config  # noqa: E402
+import database  # noqa: E402
+from handlers_admin import approve_page  # noqa: E402
+
+
+def run(scenario):
+    async def main():
+        try:
+            await database.init_db()
+            return await scenario()
+        finally:
+            # Each asyncio.run() gets a new loop, so stop the writer with it.
+            if database._writer_task is not None:
+                database._write_queue.put_nowait(None)
+                await database._writer_task
+                database._writer_task = None
+
+    return asyncio.run(main())
+
+
+def fake_call(data):
+    return SimpleNamespace(
+        data=data,
+        from_user=SimpleNamespace(id=config.ADMIN_ID),
+        answer=AsyncMock(),
+        message=SimpleNamespace(edit_text=AsyncMock()),
+    )
+
+
+async def create_deposits(user_id, count):
+    await database.add_user(user_id)
+    return [await database.create_deposit(user_id, "test", 1000, "photo") for _ in range(count)]
+
+
+async def create_withdrawals(user_id, count):
+    deposit_id = (await create_deposits(user_id, 1))[0]
+    await database.confirm_deposit(deposit_id)
+    return [await database.create_withdrawal(user_id, 100, "8600") for _ in range(count)]
+
+
+def test_deposit_page_approves_only_its_rows():
+    async def scenario():
+        ids = await create_deposits(100, 4)
+        call = fake_call(f"bulk:deposits:{ids[0]}:{ids[1]}")
+        await approve_page(call, AsyncMock())
+        return ids, await database.get_pending_deposit_ids_between(ids[0], ids[-1])
+
+    ids, pending = run(scenario)
+    assert pending == ids[2:]
+
+
+def test_stale_deposit_page_does_not_approve_older_rows():
+    async def scenario():
+        ids = await create_deposits(101, 4)
+        # The admin opens the page with the two newest deposits, but they are
+        # approved elsewhere before the button is pressed.
+        await database.confirm_deposits(ids[2:])
+        call = fake_call(f"bulk:deposits:{ids[2]}:{ids[3]}")
+        await approve_page(call, AsyncMock())
+        return ids, call, await database.get_pending_deposit_ids_between(ids[0], ids[-1])
+
+    ids, call, pending = run(scenario)
+    assert pending == ids[:2]
+    call.message.edit_text.assert_not_called()
+
+
+def test_stale_withdrawal_page_does_not_approve_older_rows():
+    async def scenario():
+        ids = await create_withdrawals(102, 4)
+        await database.confirm_withdrawals(ids[2:])
+        call = fake_call(f"bulk:withdrawals:{ids[2]}:{ids[3]}")
+        await approve_page(call, AsyncMock())
+        return ids, call, await database.get_pending_withdrawal_ids_between(ids[0], ids[-1])
+
+    ids, call, pending = run(scenario)
+    assert pending == ids[:2]
+    call.message.edit_text.assert_not_called()
+
+
+def test_withdrawal_without_balance_stays_pending():
+    async def scenario():
+        await database.add_user(103)
+        req_id = await database.create_withdrawal(103, 100, "8600")
+        call = fake_call(f"bulk:withdrawals:{req_id}:{req_id}")
+        await approve_page(call, AsyncMock())
+        user = await database.get_user(103)
+        return req_id, call, user, await database.get_pending_withdrawal_ids_between(req_id, req_id)
+
+    req_id, call, user, pending = run(scenario)
+    assert pending == [req_id]
+    assert user["balance"] == 0
+    assert "0/1" in call.message.edit_text.call_args.args[0]
@@ -0,0 +1,30 @@
+import os
+
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+
+from cache import LRUCache  # noqa: E402
+
+
+def test_fill_ignores_writes_to_other_keys():
+    cache = LRUCache(maxsize=10)
+    generation = cache.generation
+    cache.put("a", 1)
+    cache.fill("b", 2, generation)
+    assert cache.get("b") == 2
+
+
+def test_fill_drops_read_older_than_write():
+    cache = LRUCache(maxsize=10)
+    generation = cache.generation
+    cache.invalidate("b")
+    cache.fill("b", 2, generation)
+    assert cache.get("b") is None
+
+
+def test_fill_is_conservative_once_stamps_are_forgotten():
+    cache = LRUCache(maxsize=2)
+    generation = cache.generation
+    for key in "xyz":
+        cache.put(key, 0)
+    cache.fill("b", 2, generation)
+    assert cache.get("b") is None